@@ -0,0 +1,117 @@
+"""
+Converts OBD CSV logs to KML, spreading the logs over several processes.
+
+Usage:
+
+    python batch.py [-j workers] [--name name] [--precision places] [--compact] output log [log ...]
+
+Each log becomes a Placemark holding a gx:Track, with the Schema of its columns.  Both are
+built and rendered without line breaks in a worker process, and only the text is sent
+back.  A directory given as a log is searched for *.log files.  The Placemarks are added
+to one Document in the order the logs were given, with the logs of each directory in name
+order, so the output is the same however many workers are used.  output may be a .kml or
+a .kmz file.
+
+From Python:
+
+    import batch
+    k = batch.convert(['logs/2017-05'], 'may.kmz', workers = 8)
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from glob import glob
+from itertools import chain
+
+import kml3
+
+# Track settings for the logs written by the OBD logger
+trackSettings = {'timeField'   : 'TIMESTAMP',
+                 'timeFormat'  : '%Y-%m-%d %H:%M:%S',
+                 'coordFields' : ['LONGITUDE', 'LATITUDE', 'ALTITUDE'],
+                 'angleFields' : ['HEADING']}
+
+def findLogs(paths, pattern = '*.log'):
+    # Replaces each directory in paths with the logs in it, in name order
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(glob(os.path.join(p, pattern)))
+        else:
+            files.append(p)
+    return files
+
+def convertLog(file, precision = None, **settings):
+    """
+    Builds the Schema and the Placemark of one log and returns their KML text, without
+    indentation or line breaks.  This is the work done in each worker process.
+
+    The Placemark is named after the log file.  settings are the Track settings, such as
+    timeField and coordFields, and replace those in trackSettings.
+    """
+    stem = os.path.splitext(os.path.basename(file))[0]
+    # Schema ids must be unique in the Document, and must not start with a digit
+    schema = kml3.Schema(name = 'obd', id = re.sub(r'[^\w.-]', '_', 'obd_' + stem))
+    schema.loadFromCSV(file)
+    placemark = kml3.Placemark(name = stem,
+                               geometry = kml3.Track(schema = schema, csvFile = file,
+                                                     extendedData = kml3.ExtendedData(),
+                                                     **dict(trackSettings, **settings)))
+    if precision is not None:
+        placemark.geometry.precision = precision
+    placemark.geometry.loadCSV()
+    return ''.join(chain(schema._render(0, ''), placemark._render(0, '')))
+
+def convertLogs(files, workers = None, precision = None, **settings):
+    """
+    Converts each log in files with convertLog() in a pool of workers processes (one
+    per CPU by default).  Returns the KML text of each log, in the order of files.
+    """
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(partial(convertLog, precision = precision, **settings), files))
+
+def convert(paths, output = None, workers = None, name = None, precision = None, pretty = True, **settings):
+    """
+    Converts logs to one KML document.
+
+    Syntax:
+
+        k = convert(paths, [output], [workers], [name], [precision], [pretty], [**settings])
+
+    Args:
+
+        paths           : (list) Log files, or directories of *.log files
+        output          : (str) KML or KMZ file to save the document to (optional)
+        workers         : (int) Worker processes.  One per CPU if not given.
+        name            : (str) Name of the Document (optional)
+        precision       : (int) Decimal places of the coordinates (optional)
+        pretty          : (bool) Indent the saved document
+        settings        : Track settings that differ from trackSettings
+
+    Returns the KML object.  Each log is held in it as a Fragment of KML text.
+    """
+    document = kml3.Document(name = name) if name is not None else kml3.Document()
+    for text in convertLogs(findLogs(paths), workers, precision, **settings):
+        document.append(kml3.Fragment(text = text), False)
+    k = kml3.KML()
+    with kml3.noCopy():
+        k.feature = document
+    if output is not None:
+        k.save(output, pretty = pretty)
+    return k
+
+def main(args = None):
+    parser = argparse.ArgumentParser(description = 'Converts OBD CSV logs to KML in parallel.')
+    parser.add_argument('output', help = 'KML or KMZ file to write')
+    parser.add_argument('logs', nargs = '+', help = 'log files, or directories of *.log files')
+    parser.add_argument('-j', '--workers', type = int, help = 'worker processes (default: one per CPU)')
+    parser.add_argument('--name', help = 'name of the Document')
+    parser.add_argument('--precision', type = int, help = 'decimal places of the coordinates')
+    parser.add_argument('--compact', action = 'store_true', help = 'write without indentation or line breaks')
+    args = parser.parse_args(args)
+    convert(args.logs, args.output, args.workers, args.name, args.precision, not args.compact)
+
+if __name__ == '__main__':
+    main()
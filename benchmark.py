@@ -0,0 +1,187 @@
+"""
+Benchmarks for kml3.
+
+Usage:
+
+    python benchmark.py [count]
+
+Builds count Placemarks (default 50000), each with a name, description, style URL and a
+Point geometry, and reports the memory used per Placemark and the time taken to build
+and serialize them.  The build is also timed inside kml3.noCopy(), and inside both
+noCopy() and kml3.trusted(), and adding the Placemarks to a Document is timed both ways.
+Writing the Document again inside kml3.cached() after changing a few Placemarks is timed
+against the first write, as is writing it without indentation.  The Placemarks are
+indexed by location, and finding those within 100 km of a point near them and the 10
+nearest to it are timed.  A CoordinateArray of count points is written with every digit
+and rounded to 6 decimal places, and a track of count points that turns every 60 points
+is simplified to within 5 metres.  Finally, Coordinates of increasing length are
+serialized to check that the time per point stays flat.
+"""
+import math
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+
+import kml3
+
+def makePlacemark(i):
+    c = kml3.Coordinates()
+    c.append(kml3.Coordinate(longitude = (i % 360) - 180, latitude = (i % 180) - 90, altitude = i))
+    return kml3.Placemark(name = 'Placemark {}'.format(i),
+                          description = 'Benchmark placemark',
+                          styleUrl = '#benchmark',
+                          geometry = kml3.Point(coordinates = c))
+
+def nodeMemory(count):
+    # Bytes still allocated per Placemark once all of them have been built
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    nodes = [makePlacemark(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / count
+
+def buildTime(count):
+    start = perf_counter()
+    nodes = [makePlacemark(i) for i in range(count)]
+    return perf_counter() - start, nodes
+
+def noCopyBuildTime(count):
+    start = perf_counter()
+    with kml3.noCopy():
+        nodes = [makePlacemark(i) for i in range(count)]
+    return perf_counter() - start
+
+def trustedBuildTime(count):
+    start = perf_counter()
+    with kml3.noCopy(), kml3.trusted():
+        nodes = [makePlacemark(i) for i in range(count)]
+    return perf_counter() - start
+
+def documentTime(nodes, copy):
+    start = perf_counter()
+    d = kml3.Document(name = 'Benchmark')
+    for n in nodes:
+        d.append(n, copy)
+    return perf_counter() - start, d
+
+def serializeTime(d, nl = '\n'):
+    # Seconds to write d from a cold cache, with nl = '' for no indentation or line breaks
+    d._invalidateAll()
+    start = perf_counter()
+    for chunk in d._render(0, nl):
+        pass
+    return perf_counter() - start
+
+def reserializeTime(d, edits = 10):
+    # Renders d once inside cached() to fill its cache, then changes a few Placemarks and
+    # renders it again.  The cache is dropped afterwards.
+    with kml3.cached():
+        for chunk in d._render():
+            pass
+        step = max(len(d) // edits, 1)
+        for i in range(0, len(d), step):
+            d[i].name = 'Edited {}'.format(i)
+        start = perf_counter()
+        for chunk in d._render():
+            pass
+        seconds = perf_counter() - start
+    d._invalidateAll()
+    return seconds
+
+def queryTimes(d, queries = 1000):
+    # Seconds to index the Placemarks of d, and seconds per query to find those within
+    # 100 km of a point and the 10 nearest to it.  The points are up to a degree from a
+    # Placemark.
+    random.seed(1)
+    points = []
+    for i in range(queries):
+        c = d[random.randrange(len(d))].geometry.coordinates[0]
+        points.append((max(-90, min(90, c.latitude + random.uniform(-1, 1))),
+                       max(-180, min(180, c.longitude + random.uniform(-1, 1)))))
+    start = perf_counter()
+    d.buildIndex()
+    build = perf_counter() - start
+    start = perf_counter()
+    for latitude, longitude in points:
+        d.queryRadius(latitude, longitude, 100000)
+    radius = (perf_counter() - start) / queries
+    start = perf_counter()
+    for latitude, longitude in points:
+        d.nearest(latitude, longitude, 10)
+    return build, radius, (perf_counter() - start) / queries
+
+def precisionTimes(count, precision = 6):
+    # Seconds and characters to write count points, with every digit and then rounded
+    a = kml3.CoordinateArray([i * 0.000123456789 - 180 for i in range(count)],
+                             [i * 0.0000987654321 - 89 for i in range(count)],
+                             [i * 0.1 for i in range(count)])
+    results = []
+    for p in (None, precision):
+        if p is not None:
+            a.precision = p
+        start = perf_counter()
+        size = sum(len(chunk) for chunk in a._render())
+        results.append((perf_counter() - start, size))
+    return results
+
+def simplifyTime(count, tolerance = 5.0, turn = 60):
+    # Seconds to simplify a track of count points that changes heading every turn points
+    # with a little noise, and the fraction of points removed
+    random.seed(1)
+    longitudes, latitudes = [], []
+    x, y = 144.9, -37.8
+    for i in range(count):
+        if i % turn == 0:
+            heading = random.uniform(0, 2 * math.pi)
+        x += math.cos(heading) * 0.00015
+        y = max(-89, min(89, y + math.sin(heading) * 0.00012))
+        longitudes.append(((x + 180) % 360) - 180 + random.gauss(0, 0.000002))
+        latitudes.append(y + random.gauss(0, 0.000002))
+    a = kml3.CoordinateArray(longitudes, latitudes)
+    start = perf_counter()
+    ratio = a.simplify(tolerance)
+    return perf_counter() - start, ratio
+
+def scalingTimes(count, steps = 3):
+    # Seconds per point to serialize Coordinates of count, 2 * count, 4 * count points
+    times = []
+    for s in range(steps):
+        n = count << s
+        c = kml3.Coordinates()
+        with kml3.noCopy():
+            for i in range(n):
+                c.append(kml3.Coordinate(longitude = (i % 360) - 180, latitude = (i % 180) - 90))
+        start = perf_counter()
+        for chunk in c._chunks():
+            pass
+        times.append((n, (perf_counter() - start) / n))
+    return times
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print('Placemarks        : {}'.format(count))
+    print('Memory / Placemark: {:.0f} bytes'.format(nodeMemory(count)))
+    seconds, nodes = buildTime(count)
+    print('Build             : {:.2f}s'.format(seconds))
+    print('Build (noCopy)    : {:.2f}s'.format(noCopyBuildTime(count)))
+    print('Build (trusted)   : {:.2f}s'.format(trustedBuildTime(count)))
+    seconds, d = documentTime(nodes, True)
+    print('Document          : {:.2f}s'.format(seconds))
+    seconds, d = documentTime(nodes, False)
+    print('Document (no copy): {:.2f}s'.format(seconds))
+    print('Serialize         : {:.2f}s'.format(serializeTime(d)))
+    print('Compact           : {:.2f}s'.format(serializeTime(d, '')))
+    print('Serialize (cached): {:.2f}s'.format(reserializeTime(d)))
+    build, radius, nearest = queryTimes(d)
+    print('Index             : {:.2f}s'.format(build))
+    print('Radius query      : {:.0f}us'.format(radius * 1e6))
+    print('Nearest 10        : {:.0f}us'.format(nearest * 1e6))
+    (full, fullSize), (rounded, roundedSize) = precisionTimes(count)
+    print('Points (all digits): {:.2f}s, {} chars'.format(full, fullSize))
+    print('Points (6 places)  : {:.2f}s, {} chars'.format(rounded, roundedSize))
+    seconds, ratio = simplifyTime(count)
+    print('Simplify          : {:.2f}s, {:.1%} removed'.format(seconds, ratio))
+    for n, seconds in scalingTimes(count):
+        print('Serialize {:>8} : {:.2f}us / point'.format(n, seconds * 1e6))
@@ -1,19 +1,25 @@
 import logging
 
-logger = logging.getLogger()
-# Remove after testing
-f = logging.Formatter('%(levelname)-8s:%(funcName)-20s %(lineno)-5s:%(message)s')
-h = logging.StreamHandler()
-h.setFormatter(f)
-logger.addHandler(h)
-logger.setLevel(logging.DEBUG)
+# kml3 does not configure logging.  Use addHook(logHook) to have construction and
+# attribute events logged at DEBUG level.
+logger = logging.getLogger(__name__)
 
 from datetime import datetime
 from time import time
 from inspect import getmro
 from enum import Enum, EnumMeta
-from collections import deque
 from copy import deepcopy
+# Imported under private names, so that 'from kml3 import *' does not pass them on
+from datetime import timedelta as _timedelta
+from time import monotonic as _monotonic, sleep as _sleep
+from contextlib import contextmanager as _contextmanager
+from types import MemberDescriptorType as _MemberDescriptorType
+from array import array as _array
+from itertools import (chain as _chain, compress as _compress, islice as _islice, product as _product,
+                       repeat as _repeat)
+from math import (asin as _asin, atan as _atan, cos as _cos, degrees as _degrees, hypot as _hypot, pi as _pi,
+                  radians as _radians, sin as _sin, sqrt as _sqrt, tan as _tan)
+from heapq import heappop as _heappop, heappush as _heappush, heapreplace as _heapreplace
 
 ################################################################################################
 #                                                                                              #
@@ -43,6 +49,8 @@ class number(float):
     #
     # Contained By : LabelStyle, IconStyle, Coords, LookAtCoords
     # 
+    __slots__ = ()
+
     def __new__(self, value):
         if not number.isFloat(value):
             #if type(value) not in [float, int]:
@@ -65,6 +73,10 @@ class number(float):
         except ValueError:
             return False
 
+    def __deepcopy__(self, memo):
+        # Numbers are immutable, so copies can share them
+        return self
+
 class colorAttribute(int):
     """
     Represents a single color attribute.
@@ -94,6 +106,8 @@ class colorAttribute(int):
     # Contained By : Color
     # 
 
+    __slots__ = ()
+
     def __new__(self, value=0):
         if type(value) not in [int, str]:
             raise TypeError('Value must be of type int or str, not {}'.format(value.__class__.__name__))
@@ -106,6 +120,10 @@ class colorAttribute(int):
     def __str__(self):
         return '{:02X}'.format(self)
 
+    def __deepcopy__(self, memo):
+        # Immutable, so copies can share it
+        return self
+
 class numberPercent(number):
     """
     Represents a percentage value between 0.0 and 1.0
@@ -133,6 +151,8 @@ class numberPercent(number):
     # Contained By : LineStyle,
     # 
 
+    __slots__ = ()
+
     def __init__(self, value):
         if not (0.0 <= value <= 1.0):
             raise ValueError('Value out of range')
@@ -154,6 +174,8 @@ class angle90(number):
         TypeError       : value is not int or float
         ValueError      : value is below -90.0 or not below 90.0
     """
+    __slots__ = ()
+
     def __init__(self, value):
         if not (-90.0 <= value < 90.0):
             raise ValueError('Value out of range')
@@ -175,6 +197,8 @@ class anglepos90(number):
         TypeError       : value is not int or float
         ValueError      : value is below 0.0 or above 90.0
     """
+    __slots__ = ()
+
     def __init__(self, value):
         if not (0.0 <= value <= 90.0):
             raise ValueError('Value out of range')
@@ -196,6 +220,8 @@ class angle180(number):
         TypeError       : value is not int or float
         ValueError      : value is below -180.0 or not below 180.0
     """
+    __slots__ = ()
+
     def __init__(self, value):
         if not (-180.0 <= value < 180.0):
             raise ValueError('Value out of range')
@@ -217,6 +243,8 @@ class angle360(number):
         TypeError       : value is not int or float
         ValueError      : value is below 0.0 or not below 360.0
     """
+    __slots__ = ()
+
     def __init__(self, value):
         if not (0.0 <= value < 360.0):
             raise ValueError('Value out of range')
@@ -261,6 +289,8 @@ class Color(object):
     # Contained by : ColorStyle
     #
 
+    __slots__ = ('__alpha', '__red', '__green', '__blue')
+
     def __init__(self, *args):
         
         self.__alpha = colorAttribute(255)
@@ -268,7 +298,7 @@ class Color(object):
         self.__green = colorAttribute(255)
         self.__blue = colorAttribute(255)
         self.__setup(*args)
-        logging.debug('Color created')
+        if _hooks: _emit('create', self)
 
     def __setup(self, *args):
         if len(args) == 1:                  # If there is only one argument, assume it is a color code
@@ -276,25 +306,30 @@ class Color(object):
                 if len(args[0]) != 8:       # check it's length
                     raise ValueError('Color value must be 8 bytes in length, aabbggrr. See help(Color).')
                 else:
-                    self.color = args[0]    # Assign it to the setter to interpret
+                    self.__setColor(args[0])    # Interpret it as the setter does
         elif len(args) == 4:                # If there are 4 arguments, assume they are color attribute assignments
-            self.alpha = args[0]
-            self.blue = args[1]
-            self.green = args[2]
-            self.red = args[3]
+            self.__alpha = colorAttribute(args[0])
+            self.__blue = colorAttribute(args[1])
+            self.__green = colorAttribute(args[2])
+            self.__red = colorAttribute(args[3])
         else:
             raise RuntimeError('Invalid number of arguments for Color.  See help(Color) for usage.')
     
+    def __setColor(self, value):
+        self.__alpha = colorAttribute(value[:2])
+        self.__blue = colorAttribute(value[2:4])
+        self.__green = colorAttribute(value[4:6])
+        self.__red = colorAttribute(value[6:8])
+    
+    # The setters below change the color in place, so output that holds it is rendered again
     @property
     def color(selfself):
         return self.__str__()
     
     @color.setter
     def color(self, value):
-        self.__alpha = colorAttribute(value[:2])
-        self.__blue = colorAttribute(value[2:4])
-        self.__green = colorAttribute(value[4:6])
-        self.__red = colorAttribute(value[6:8])
+        self.__setColor(value)
+        _valueEdited()
     
     @property
     def alpha(self):
@@ -303,6 +338,7 @@ class Color(object):
     @alpha.setter
     def alpha(self, value):
         self.__alpha = colorAttribute(value)
+        _valueEdited()
 
     @property
     def red(self):
@@ -311,6 +347,7 @@ class Color(object):
     @red.setter
     def red(self, value):
         self.__red = colorAttribute(value)
+        _valueEdited()
 
     @property
     def green(self):
@@ -319,6 +356,7 @@ class Color(object):
     @green.setter
     def green(self, value):
         self.__green = colorAttribute(value)
+        _valueEdited()
 
     @property
     def blue(self):
@@ -327,6 +365,7 @@ class Color(object):
     @blue.setter
     def blue(self, value):
         self.__blue = colorAttribute(value)
+        _valueEdited()
 
     def __str__(self):
         return str(self.__alpha) + str(self.__blue) + str(self.__green) + str(self.__red)
@@ -355,11 +394,14 @@ class KMLDateTime(object):
     #
     # Contained By : TimeSpan, TimeStamp
     #
+    __slots__ = ('__value', '__format')
 
-    def __init__(self, value=datetime.now()):
+    def __init__(self, value=datetime.now(), format=None):
         self.__value = None
         self.__format = None
-        self.value = value
+        self.__setValue(value)
+        if format is not None:
+            self.__setFormat(format)
         #self.__precision = 4
 
     @property
@@ -389,15 +431,20 @@ class KMLDateTime(object):
             t = d.seconds + round(d.microseconds / 1000000)
             return '{}{:+03}:{:02}'.format(self.__value.isoformat().split('.')[0], divmod(t, 3600)[0], divmod(t, 3600)[1])
 
+    # The setters below change the value in place, so output that holds it is rendered again
     @value.setter
     def value(self, value):
+        self.__setValue(value)
+        _valueEdited()
+
+    def __setValue(self, value):
         if value is not None:
             if type(value) is datetime:
                 self.__value = value
                 self.__format = 'dateTime'
                 return
             if type(value) is str:
-                self.format = self.__getFormat(value)
+                self.__setFormat(self.__getFormat(value))
                 # Convert strings to date based in value of format
                 if self.format == 'gYear':
                     # Check the Year to make sure it is are valid numbers.  If so, reasemble and convert
@@ -443,6 +490,10 @@ class KMLDateTime(object):
     
     @format.setter
     def format(self, value):
+        self.__setFormat(value)
+        _valueEdited()
+    
+    def __setFormat(self, value):
         if value not in ['gYear',             # Year only
                          'gYearMonth',        # Year and Month
                          'date',              # Year, Month and Day
@@ -479,6 +530,157 @@ class KMLDateTime(object):
     def __str__(self):
         return self.value
 
+    @property
+    def timestamp(self):
+        """
+        Returns the value as seconds since 1970-01-01 UTC.  Values without a time zone are taken as UTC.
+        """
+        if self.__value.tzinfo is None:
+            return (self.__value - datetime(1970, 1, 1)).total_seconds()
+        return self.__value.timestamp()
+
+    # strptime formats for the KML formats that can be parsed column-wise,
+    # and other common log formats tried when a column matches no KML format
+    __columnFormats = {'gYear'      : '%Y',
+                       'gYearMonth' : '%Y-%m',
+                       'date'       : '%Y-%m-%d',
+                       'dateTime'   : '%Y-%m-%dT%H:%M:%SZ'}
+    __logFormats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y/%m/%d %H:%M:%S']
+
+    @classmethod
+    def parseColumn(cls, values, timeFormat = None):
+        """
+        Converts a whole column of date/time values to seconds since 1970-01-01 UTC.
+        
+        The format is worked out once from the first value rather than for every value.
+        Fixed width formats made up of %Y, %m, %d, %H, %M and %S are read by slicing the
+        strings directly; anything else falls back to strptime.
+        
+        Syntax:
+        
+            timestamps, format = KMLDateTime.parseColumn(values, [timeFormat])
+        
+        Args:
+        
+            values          : (iterable) str, datetime or KMLDateTime values
+            timeFormat      : (str) strptime format of the strings (optional).
+                                    If not given, KML date/time formats and a few common
+                                    log formats such as '%Y-%m-%d %H:%M:%S' are detected.
+        
+        Returns the timestamps as an array('d') and the KML format to write them in.
+        
+        Errors:
+        
+            ValueError      : a value does not match the format of the column
+        """
+        timestamps = _array('d')
+        parse = None
+        format = 'dateTime'
+        for v in values:
+            if parse is None:
+                parse, format = cls._columnParser(v, timeFormat)
+            timestamps.append(parse(v))
+        return timestamps, format
+
+    @classmethod
+    def _columnParser(cls, value, timeFormat):
+        # Pick the parser for a column based on its first value.  Returns the parser and
+        # the KML format of the column.
+        if type(value) is not str:
+            if type(value) is not KMLDateTime:
+                value = KMLDateTime(value)
+            return (lambda v: (v if type(v) is KMLDateTime else KMLDateTime(v)).timestamp), value.format
+        if timeFormat is not None:
+            return cls.__stringParser(timeFormat), 'dateTime'
+        try:
+            format = cls.__getFormat(None, value)
+        except ValueError:
+            for f in cls.__logFormats:
+                try:
+                    datetime.strptime(value, f)
+                except ValueError:
+                    continue
+                return cls.__stringParser(f), 'dateTime'
+            raise
+        if format in cls.__columnFormats:
+            return cls.__stringParser(cls.__columnFormats[format]), format
+        # Time zone offsets are rare enough to be left to KMLDateTime
+        return (lambda v: KMLDateTime(v).timestamp), 'dateTime'
+
+    @classmethod
+    def __stringParser(cls, timeFormat):
+        # Builds a parser for one strptime format.  Formats with fixed width fields are
+        # read by slicing, with strptime only used for strings that don't fit the layout.
+        widths = {'Y': 4, 'm': 2, 'd': 2, 'H': 2, 'M': 2, 'S': 2}
+        fields = {}
+        literals = []
+        position = 0
+        i = 0
+        while i < len(timeFormat):
+            if timeFormat[i] == '%':
+                code = timeFormat[i + 1:i + 2]
+                if code not in widths or code in fields:
+                    return lambda v: (datetime.strptime(v, timeFormat) - datetime(1970, 1, 1)).total_seconds()
+                fields[code] = (position, position + widths[code])
+                position += widths[code]
+                i += 2
+            else:
+                literals.append((position, timeFormat[i]))
+                position += 1
+                i += 1
+        width = position
+        y = fields.get('Y')
+        m = fields.get('m')
+        d = fields.get('d')
+        H = fields.get('H')
+        M = fields.get('M')
+        S = fields.get('S')
+        epoch = datetime(1970, 1, 1).toordinal()
+        days = {}
+        
+        def parse(v):
+            if len(v) != width or any(v[p] != c for p, c in literals):
+                return (datetime.strptime(v, timeFormat) - datetime(1970, 1, 1)).total_seconds()
+            date = (v[y[0]:y[1]] if y else '1900', v[m[0]:m[1]] if m else '1', v[d[0]:d[1]] if d else '1')
+            day = days.get(date)
+            if day is None:
+                # datetime() validates the date; each distinct date is only converted once
+                day = days[date] = datetime(int(date[0]), int(date[1]), int(date[2])).toordinal() - epoch
+            hour = int(v[H[0]:H[1]]) if H else 0
+            minute = int(v[M[0]:M[1]]) if M else 0
+            second = int(v[S[0]:S[1]]) if S else 0
+            if hour > 23 or minute > 59 or second > 59:
+                raise ValueError('time data {} does not match format {}'.format(v, timeFormat))
+            return day * 86400.0 + hour * 3600 + minute * 60 + second
+        return parse
+
+    @classmethod
+    def formatColumn(cls, timestamps, format = 'dateTime'):
+        """
+        Generates the KML text of a column of timestamps (seconds since 1970-01-01 UTC).
+        
+        Used to write Track times at output time rather than storing a string per value.
+        Formats other than gYear, gYearMonth and date are written as dateTime.
+        """
+        days = {}
+        for t in timestamps:
+            day, seconds = divmod(t, 86400)
+            date = days.get(day)
+            if date is None:
+                d = datetime(1970, 1, 1) + _timedelta(days = day)
+                if format == 'gYear':
+                    date = '{:04}'.format(d.year)
+                elif format == 'gYearMonth':
+                    date = '{:04}-{:02}'.format(d.year, d.month)
+                else:
+                    date = '{:04}-{:02}-{:02}'.format(d.year, d.month, d.day)
+                days[day] = date
+            if format in ['gYear', 'gYearMonth', 'date']:
+                yield date
+            else:
+                hour, seconds = divmod(int(seconds), 3600)
+                yield '{}T{:02}:{:02}:{:02}Z'.format(date, hour, seconds // 60, seconds % 60)
+
 ################################################################################################
 #                                                                                              #
 #   KML Enum definitions                                                                       #
@@ -655,264 +857,1208 @@ class playModeEnum(Enum):
 
 ################################################################################################
 #                                                                                              #
-#   KML Abstract Object definitions (base classes)                                             #
+#   Column and CSV helpers                                                                     #
 #                                                                                              #
 ################################################################################################
 
-class KMLObject(object):
+def _floatArray(values):
+    """
+    Returns values as an array('d').
+    
+    Arrays that are already of type 'd' are copied directly.  Anything else is converted
+    item by item with float(), so numeric strings are accepted.  None is stored as NaN,
+    which is used throughout to mark a missing value.
+    """
+    if type(values) is _array and values.typecode == 'd':
+        return _array('d', values)
+    return _array('d', [float('nan') if v is None else float(v) for v in values])
 
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__depth = 0
-        self.__permittedAttributes = ['id','depth','indent','_set_depth','getID','checkAttributes'] + permittedAttributes
-        
-        for k in kwargs:
-            setattr(self, k, kwargs[k])
-        
-        logging.debug('{} created'.format(self.__class__.__name__))
+def _checkRange(values, valueType):
+    """
+    Validates a whole column of floats against a number type in one go.
     
-    def __getattribute__(self, name):
-        # Pass all inbuilt functions and private attributes up to super()
-        if '__' in name:        return super().__getattribute__(name)
-        
-        # Exclude anything thats not in the permitted list
-        if name not in self.__permittedAttributes:
-            raise AttributeError('Attribute {} not supported by object {}'.format(name, self.__class__.__name__))
+    Every number type describes a continuous range, so only the smallest and largest
+    values need to be checked.  NaN (missing) values are ignored.
+    
+    Errors:
+    
+        ValueError      : a value in the column is out of range for valueType
+    """
+    present = [v for v in values if v == v]
+    if len(present) > 0:
+        valueType(min(present))
+        valueType(max(present))
 
-        return super().__getattribute__(name)
+def _floatColumn(values):
+    """
+    Converts a column of strings (such as a CSV column) to an array('d').
     
+    Anything that can not be read as a number, such as '-' or an empty string, is
+    stored as NaN to mark the value as missing.
+    """
+    column = _array('d')
+    nan = float('nan')
+    for v in values:
+        try:
+            column.append(float(v))
+        except (TypeError, ValueError):
+            column.append(nan)
+    return column
 
-    def __setattr__(self, name, value):
-        if '__' in name:
-            super().__setattr__(name, value)
+def _formatColumn(values, precision = None):
+    """
+    Formats a whole column of floats as strings in one go.
+    
+    Values are rounded to precision decimal places first if precision is given, and are
+    written in their shortest form, so 144.96 is '144.96' rather than '144.960000'.
+    Missing (NaN) values come out as 'nan', so callers check the column itself.
+    """
+    if precision is None:
+        return list(map(str, values))
+    if precision > 0:
+        # Fixed point formatting is much quicker than str(), even with the zeros removed
+        fixed = '%.{}f'.format(precision).__mod__
+        text = [v.rstrip('0').rstrip('.') for v in map(fixed, values)]
+        # Small negative values round to '-0'
+        return [v if v != '-0' else '0' for v in text]
+    # Adding 0.0 turns -0.0 into 0.0
+    return [str(v + 0.0) for v in map(round, values, _repeat(precision))]
+
+def _indent(depth, nl):
+    # Indentation of a line at depth, or none when the output has no line breaks
+    return ' ' * depth if nl else ''
+
+def _joinLines(indent, lines, nl = '\n', gap = '', batch = 1024):
+    """
+    Yields lines, each with indent and the line break nl, joined into blocks of batch lines.
+    
+    Used for long lists of values, where one chunk per line would cost more to pass
+    along than to format.  When nl is empty the lines are run together, separated by
+    gap.
+    """
+    lines = iter(lines)
+    separator = nl + indent if nl else gap
+    lead = indent
+    while True:
+        block = list(_islice(lines, batch))
+        if len(block) == 0:
             return
-        
-        if name not in self.__permittedAttributes:
-            raise AttributeError('Attribute {} not supported by object {}'.format(name, self.__class__.__name__))
-        
-        if name not in attributeTypes:
-            raise RuntimeError('Type for attribute {} not defined'.format(name))
+        yield lead + separator.join(block) + nl
+        if not nl:
+            lead = gap
+
+def _csvPositions(reader, fields, file):
+    # Reads the heading row of a CSV reader and returns the position of each field and
+    # the number of headings
+    headings = next(reader)
+    positions = {h: i for i, h in reversed(list(enumerate(headings)))}
+    for f in fields:
+        if f not in positions:
+            raise KeyError('Field {} not found in {}'.format(f, file))
+    return [positions[f] for f in fields], len(headings)
+
+def _readColumns(file, fields, **fmtparams):
+    """
+    Reads the named columns of a CSV file in a single pass.
+    
+    Returns a dict of field name to a list of the raw string values in that column.
+    Short rows are padded with empty strings and blank lines are skipped.
+    
+    Errors:
+    
+        KeyError        : a field is not in the heading row of the file
+    """
+    import csv
+    fields = list(dict.fromkeys(fields))
+    with open(file, newline = '') as csvfile:
+        reader = csv.reader(csvfile, **fmtparams)
+        positions, width = _csvPositions(reader, fields, file)
+        return dict(zip(fields, _readRows(reader, positions, width)))
+
+def _readRows(reader, positions, width):
+    # Reads the rest of a CSV reader into one list of raw strings for each position.
+    # Short rows are padded to width and blank lines are skipped.
+    columns = [[] for i in positions]
+    appends = [(c.append, i) for c, i in zip(columns, positions)]
+    for row in reader:
+        if len(row) == 0:
+            continue
+        if len(row) < width:
+            row += [''] * (width - len(row))
+        for append, i in appends:
+            append(row[i])
+    return columns
+
+def _iterRows(file, fields, **fmtparams):
+    """
+    Reads the named columns of a CSV file one row at a time.
+    
+    Yields a list of the raw string values of each row, in the order of fields.  Short
+    rows are padded with empty strings and blank lines are skipped.
+    
+    Errors:
+    
+        KeyError        : a field is not in the heading row of the file
+    """
+    import csv
+    with open(file, newline = '') as csvfile:
+        reader = csv.reader(csvfile, **fmtparams)
+        positions, width = _csvPositions(reader, fields, file)
+        for row in reader:
+            if len(row) == 0:
+                continue
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            yield [row[i] for i in positions]
 
-        # If an object is passed, clone it first
-        if KMLObject in getmro(value.__class__):
-            value = deepcopy(value)
+################################################################################################
+#                                                                                              #
+#   Geometry helpers                                                                           #
+#                                                                                              #
+################################################################################################
 
-        # Check if value is already of the correct type
-        if type(value) is attributeTypes[name]:
-            super().__setattr__(name, value)
-            #logger.debug('Attribute {} of type {} appended to {}'.format(name, type(value).__name__, self.__class__.__name__))                          
-            if hasattr(value, 'depth'):
-                value.depth = self.__depth + 1
-            return
+# Mean radius of the earth in metres
+_earthRadius = 6371008.8
 
-        # Check for derived types
-        p = [x for x in getmro(value.__class__) if x.__module__ == self.__class__.__module__ and x.__name__ != 'KMLObject']
-        for o in p:
-            if o in getmro(attributeTypes[name]):
-                super().__setattr__(name, value)
-                logger.debug('Attribute {} of type {} appended to {}'.format(name, type(value).__name__, self.__class__.__name__))                          
-                if hasattr(value, 'depth'):
-                    value.depth = self.__depth + 1
-                return
-        
-        # See if the attribute expects an Enum
-        if Enum in getmro(attributeTypes[name]):
-            logger.debug('Attribute {} of type {} appended to {}'.format(name, type(attributeTypes[name]).__name__, self.__class__.__name__))                          
-            if number.isInt(value):
-                super().__setattr__(name, attributeTypes[name](int(value)))    # Set Enum by integer value                        
-            else: 
-                super().__setattr__(name, attributeTypes[name][value])         # Set the enum by name
-            return
-        
-        # Check for object of incorrect type
-        if KMLObject in getmro(value.__class__):
-            if type(value) is not attributeTypes[name]:
-                raise TypeError('Incorrect object type for {}.  Expected {}, given {}'.format(name, attributeTypes[name].__name__, value.__class__.__name__))
-            
-        # if we make it this far, then create a new instance using value as an init argument
-        tmpobj = attributeTypes[name](value)
-        logger.debug('Attribute {} of type {} appended to {}'.format(name, tmpobj.__class__.__name__, self.__class__.__name__))                          
-        if hasattr(tmpobj, 'depth'):
-            tmpobj.depth = self.__depth + 1
-        super().__setattr__(name, tmpobj)                                 # Create an instance of the type passing the value to the init
-    
-    def __str__(self):
-        tmp = ''
-        for a in self.__permittedAttributes:        # Cycle through the attributes in order
-            if a == 'id': continue
-            if a in self.__dict__:
-                if self.__dict__[a] is not None:
-                    if KMLObject in getmro(self.__dict__[a].__class__):              # Output the attribute if it has been set
-                        # Objects handle their own code formatting and indentation
-                        tmp += str(self.__dict__[a])
-                    else:
-                        # Simple attributes can be easily formatted
-                        # All enums should know how to return the proper value when requested.  See the __str__() of the respective enum.
-                        if a[:3] == 'gx_':
-                            tmp += self.indent + ' <{}>{}</{}>\n'.format(a.replace('_',':'),self.__dict__[a],a.replace('_',':'))
-                        else:
-                            tmp += self.indent + ' <{}>{}</{}>\n'.format(a,self.__dict__[a],a)
-        return tmp
+def _project(longitudes, latitudes):
+    """
+    Projects longitudes and latitudes onto a plane around their mean latitude.
     
-    @property
-    def indent(self):
-        return ' ' * self.__depth
+    Returns lists of x and y in metres.  Distances are accurate enough for the extent of
+    a track.  Points without a position are NaN and are left out of the mean.
+    """
+    total, count = sum(latitudes), len(latitudes)
+    if total != total:
+        located = [v for v in latitudes if v == v]
+        total, count = sum(located), len(located)
+    scale = _earthRadius * _pi / 180                    # Metres per degree of latitude
+    xscale = scale * _cos(_radians(total / count)) if count > 0 else scale
+    return list(map(xscale.__mul__, longitudes)), list(map(scale.__mul__, latitudes))
+
+def _farthest(xs, ys, i, j, tolerance, start = None, stop = None, step = 1):
+    # Position of the point between i and j that is farthest from the line joining them,
+    # or None if every point is within tolerance of the line.  Only the points in
+    # range(start, stop, step) are measured if it is given.
+    start = i + 1 if start is None else start
+    stop = j if stop is None else stop
+    ax, ay = xs[i], ys[i]
+    dx, dy = xs[j] - ax, ys[j] - ay
+    length = _hypot(dx, dy)
+    if length == 0:
+        # Both ends are the same point, as in a closed ring
+        d = [_hypot(x - ax, y - ay) for x, y in zip(xs[start:stop:step], ys[start:stop:step])]
+        far = max(d)
+        k = d.index(far)
+        limit = tolerance
+    else:
+        # Cross product of the line and each point, which is the distance of the point
+        # from the line times its length, offset by c.  The farthest point has the highest
+        # or the lowest value, so abs() is not needed.
+        d = [dx * y - dy * x for x, y in zip(xs[start:stop:step], ys[start:stop:step])]
+        c = dx * ay - dy * ax
+        high = max(d)
+        low = min(d)
+        if high - c >= c - low:
+            far = high - c
+            k = d.index(high)
+        else:
+            far = c - low
+            k = d.index(low)
+        limit = tolerance * length
+    return start + k * step if far > limit else None
+
+def _simplify(longitudes, latitudes, tolerance, block = 4096, sample = 64):
+    """
+    Douglas-Peucker line simplification.
+    
+    Returns the indices of the points to keep, in order.  The first and last points are
+    always kept, and every point removed lies within tolerance metres of the line between
+    the kept points either side of it.
+    
+    Points are projected by _project().  Each step measures a whole run of points at
+    once, and there is no recursion.  Long lines are simplified in blocks of block points,
+    which bounds the number of times each point is measured, and block ends that turn out
+    not to be needed are then removed.  A run longer than 2 * sample points is measured
+    at about sample points first, and while one of them is out of tolerance the run is
+    split near it, at the farthest point within a step either side, rather than at the
+    farthest point of the whole run.  This keeps a point or two more than the textbook
+    algorithm, but avoids measuring every point of a run that is far from straight.
+    """
+    n = len(longitudes)
+    if n < 3:
+        return list(range(n))
+    xs, ys = _project(longitudes, latitudes)
+    keep = bytearray(n)
+    keep[-1] = 1
+    stack = []
+    for start in range(0, n - 1, block):
+        keep[start] = 1
+        stack.append((start, min(start + block, n - 1)))
+    while len(stack) > 0:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        # A long run is measured at every step'th point first.  If one of those is out of
+        # tolerance, the run is split at the farthest point near it, and it is only
+        # measured in full once the sample is within tolerance.
+        step = (j - i) // sample
+        k = _farthest(xs, ys, i, j, tolerance, i + 1, j, step) if step > 1 else None
+        if k is not None:
+            k = _farthest(xs, ys, i, j, 0, max(k - step + 1, i + 1), min(k + step, j))
+        else:
+            k = _farthest(xs, ys, i, j, tolerance)
+        if k is not None:
+            keep[k] = 1
+            stack.append((i, k))
+            stack.append((k, j))
+    # Remove each block end if the line from the kept point before it to the kept point
+    # after it passes close enough to every point in between
+    if n - 1 > block:
+        kept = list(_compress(range(n), keep))
+        previous = 0
+        for p, q in zip(kept[1:-1], kept[2:]):
+            if p % block == 0 and _farthest(xs, ys, previous, q, tolerance) is None:
+                keep[p] = 0
+            else:
+                previous = p
+    return list(_compress(range(n), keep))
 
-    @property    
-    def depth(self, value = None):
-        return self.__depth
+def _bounds(obj):
+    """
+    Returns the bounding box of every position held by obj and the objects in it, as
+    (west, south, east, north) in degrees, or None if it holds no positions.
+    
+    Boxes are not split at the antimeridian, so a line that crosses it covers every
+    longitude in between.
+    """
+    if isinstance(obj, (Coordinates, TrackCoords)):
+        longitudes, latitudes = obj._lonLat()
+        longitudes = [v for v in longitudes if v == v]
+        latitudes = [v for v in latitudes if v == v]
+        if len(longitudes) == 0 or len(latitudes) == 0:
+            return None
+        return min(longitudes), min(latitudes), max(longitudes), max(latitudes)
+    box = None
+    for child in obj._children():
+        b = _bounds(child)
+        if b is not None:
+            box = b if box is None else (min(box[0], b[0]), min(box[1], b[1]), max(box[2], b[2]), max(box[3], b[3]))
+    return box
+
+def _distance(longitude, latitude, box):
+    """
+    Returns the distance in metres over the surface of the earth from a point to the
+    nearest point of a box of (west, south, east, north) degrees.  The box may be nearer
+    going the other way round the earth.
+    """
+    west, south, east, north = box
+    # Longitudes from the point to the nearest edge of the box.  For every latitude, the
+    # nearest point of the box is on that edge.
+    if (longitude - west) % 360 <= east - west:
+        across = 0
+    else:
+        across = min((west - longitude) % 360, (longitude - east) % 360)
+    if across == 0:
+        ends = (min(max(latitude, south), north),)
+    elif across < 90:
+        # Where a great circle through the point crosses the edge at a right angle
+        ends = (min(max(_degrees(_atan(_tan(_radians(latitude)) / _cos(_radians(across)))), south), north),)
+    else:
+        # The edge gets nearer towards a pole, so one of its ends is nearest
+        ends = (south, north)
+    # Haversine formula
+    c = _cos(_radians(latitude))
+    s = _sin(_radians(across) / 2) ** 2
+    h = min(_sin(_radians(to - latitude) / 2) ** 2 + c * _cos(_radians(to)) * s for to in ends)
+    return 2 * _earthRadius * _asin(min(_sqrt(h), 1))
+
+class GridIndex(object):
+    """
+    Spatial index of items by their bounding boxes, on a grid of square cells.
+    
+    Each item is listed in every cell its box touches, so finding the items in an area
+    only looks at the cells the area covers rather than at every item.
+    
+    Syntax:
+    
+        x = GridIndex([cellSize])
+        x.insert(item, west, south, east, north)
+        items = x.query(west, south, east, north)
+        items = x.within(longitude, latitude, metres)
+        items = x.nearest(longitude, latitude, [count])
+    
+    Args:
+    
+        cellSize        : (float) Width and height of each cell in degrees
     
-    @depth.setter
-    def depth(self, value):
-        self._set_depth(value)
+    Errors:
     
-    def _set_depth(self, value):
-        self.__depth = value
-        for a in self.__dict__:
-            if hasattr(self.__dict__[a], 'depth'):
-                setattr(self.__dict__[a], 'depth', self.__depth + 1)
+        ValueError      : cellSize is not positive
+    """
+    __slots__ = ('cellSize', '__cells', '__items', '__boxes')
 
-    @property
-    def getID(self):
-        if 'id' in self.__dict__:
-            return ' id="{}"'.format(self.__dict__['id'])
-        else:
-            return ''
+    def __init__(self, cellSize = 1.0):
+        if not cellSize > 0:
+            raise ValueError('Cell size must be positive')
+        self.cellSize = cellSize
+        self.__cells = {}               # (column, row): positions of the items in the cell
+        self.__items = []
+        self.__boxes = []
     
-    def checkAttributes(self, attributes):
-        attr = True
-        for a in attributes:
-            if a not in self.__dict__:
-                logger.warning('{} has missing required attribute {}. No tag returned.'.format(self.__class__.__name__, a))
-                attr = False
-        return attr
-        
-class altitudeMode(KMLObject):
-    # altitudeMode is slightly different as its the only enum that alters its tag based on its value
-    # Because of this, it behaves like an object rather than an attribute.
-    def __init__(self, value):
-        super().__init__(['altitudeModeEnum'])
-        self.altitudeModeEnum = altitudeModeEnum[value]
+    def __len__(self):
+        return len(self.__items)
     
-    def __str__(self):
-        if self.altitudeModeEnum.value < 3:
-            return self.indent + '<altitudeMode>{}</altitudeMode>\n'.format(self.altitudeModeEnum.name)
+    def __range(self, low, high):
+        return range(int(low // self.cellSize), int(high // self.cellSize) + 1)
+    
+    def insert(self, item, west, south, east, north):
+        """
+        Adds item with the given bounding box, in degrees.  A point has the same west and
+        east, and the same south and north.
+        """
+        i = len(self.__items)
+        self.__items.append(item)
+        self.__boxes.append((west, south, east, north))
+        for column in self.__range(west, east):
+            for row in self.__range(south, north):
+                self.__cells.setdefault((column, row), []).append(i)
+    
+    def __positions(self, west, south, east, north):
+        # Positions of the items whose boxes overlap the given box
+        columns = self.__range(west, east)
+        rows = self.__range(south, north)
+        if len(columns) * len(rows) > len(self.__cells):
+            # Fewer cells are in use than the box covers
+            cells = [c for (column, row), c in self.__cells.items() if column in columns and row in rows]
+        else:
+            cells = [self.__cells[k] for k in _product(columns, rows) if k in self.__cells]
+        found = set()
+        for c in cells:
+            found.update(c)
+        boxes = self.__boxes
+        return {i for i in found
+                if boxes[i][0] <= east and boxes[i][2] >= west and boxes[i][1] <= north and boxes[i][3] >= south}
+    
+    def __find(self, west, south, east, north):
+        # As __positions(), for a box that may cross the antimeridian
+        if west > east:
+            return self.__positions(west, south, 180, north) | self.__positions(-180, south, east, north)
+        return self.__positions(west, south, east, north)
+    
+    def query(self, west, south, east, north):
+        """
+        Returns the items whose boxes overlap the given box, in the order they were
+        inserted.  A box whose west edge is east of its east edge crosses the antimeridian.
+        """
+        return [self.__items[i] for i in sorted(self.__find(west, south, east, north))]
+    
+    def __around(self, longitude, latitude, metres):
+        # Distance of each item whose box comes within metres of the point, by position.
+        # Only the cells under the box around the circle are looked at.
+        rise = _degrees(metres / _earthRadius)
+        south, north = max(latitude - rise, -90), min(latitude + rise, 90)
+        spread = 180
+        if south > -90 and north < 90:
+            # The circle does not reach a pole, so it spans less than every longitude
+            ratio = _sin(_radians(rise)) / _cos(_radians(latitude))
+            if ratio < 1:
+                spread = _degrees(_asin(ratio))
+        if spread >= 180:
+            west, east = -180, 180
         else:
-            return self.indent + '<gx:altitudeMode>{}</gx:altitudeMode>\n'.format(self.altitudeModeEnum.name)
+            west, east = longitude - spread, longitude + spread
+            if west < -180:
+                west += 360
+            if east > 180:
+                east -= 360
+        boxes = self.__boxes
+        found = {}
+        for i in self.__find(west, south, east, north):
+            d = _distance(longitude, latitude, boxes[i])
+            if d <= metres:
+                found[i] = d
+        return found
+    
+    def within(self, longitude, latitude, metres):
+        """
+        Returns the items whose boxes come within the given distance in metres of a point,
+        in the order they were inserted.  The distance is measured by _distance().
+        """
+        return [self.__items[i] for i in sorted(self.__around(longitude, latitude, metres))]
+    
+    def nearest(self, longitude, latitude, count = 1):
+        """
+        Returns the count items whose boxes are nearest to a point, nearest first.  Items
+        at the same distance are in the order they were inserted.
         
-class Orientation(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['heading', 'tilt', 'roll']
-        super().__init__(self.__permittedAttributes, **kwargs)
+        Cells are looked at in order of their distance from the point, spreading out from
+        the cell it is in, until no cell left can hold an item nearer than those found.
+        """
+        if count < 1:
+            return []
+        size = self.cellSize
+        cells = self.__cells
+        boxes = self.__boxes
+        first, last = int(-180 // size), int(180 // size)      # Columns either side of the antimeridian
+        bottom, top = int(-90 // size), int(90 // size)
+        start = (int(longitude // size), int(latitude // size))
+        queue = [(0.0, start)]
+        queued = {start}
+        spread = True
+        measured = set()
+        best = []               # (-distance, -position) of the nearest items found, farthest first
+        while len(queue) > 0:
+            bound, (column, row) = _heappop(queue)
+            if len(best) >= count and bound > -best[0][0]:
+                break
+            for i in cells.get((column, row), ()):
+                if i in measured:
+                    continue
+                measured.add(i)
+                entry = (-_distance(longitude, latitude, boxes[i]), -i)
+                if len(best) < count:
+                    _heappush(best, entry)
+                elif entry > best[0]:
+                    _heapreplace(best, entry)
+            if spread and len(queued) > len(cells):
+                # More cells have been queued than are in use, so the cells in use are
+                # queued instead of spreading further through empty ones
+                spread = False
+                for key in cells:
+                    if key not in queued:
+                        queued.add(key)
+                        _heappush(queue, (self.__bound(longitude, latitude, key), key))
+            if spread:
+                west = column - 1 if column > first else last
+                east = column + 1 if column < last else first
+                for key in ((west, row), (east, row), (column, row - 1), (column, row + 1)):
+                    if key not in queued and bottom <= key[1] <= top:
+                        queued.add(key)
+                        _heappush(queue, (self.__bound(longitude, latitude, key), key))
+        return [self.__items[-i] for d, i in sorted(best, reverse = True)]
+    
+    def __bound(self, longitude, latitude, key):
+        # Distance from the point to the nearest point of a cell
+        column, row = key
+        size = self.cellSize
+        return _distance(longitude, latitude, (column * size, max(row * size, -90), (column + 1) * size, min((row + 1) * size, 90)))
 
-    def __str__(self):
-        tmp = self.indent + '<Orientation>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</Orientation>\n'
-        return tmp
-    
-class Location(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['longitude', 'latitude', 'altitude']
-        super().__init__(self.__permittedAttributes, **kwargs)
+################################################################################################
+#                                                                                              #
+#   KML Abstract Object definitions (base classes)                                             #
+#                                                                                              #
+################################################################################################
 
-    def __str__(self):
-        tmp = self.indent + '<Location>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</Location>\n'
-        return tmp
+# Set to False by noCopy()
+_copyObjects = True
+
+@_contextmanager
+def noCopy():
+    """
+    Stops KML objects being copied as they are assigned to an attribute or added to a
+    container.
     
-class KMLFeature(KMLObject):
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__permittedAttributes = permittedAttributes + ['name', 'description', 'visibility', 'open', 'atom_link', 
-                                      'atom_author', 'address', 'xal_AddressDetails', 'phoneNumber',
-                                      'Snippet', 'time', 'view', 'styleUrl', 'styleSelector',
-                                      'region', 'extendedData']
+    Normally every object is deep-copied as it is added, so the object passed in can be
+    changed or reused without affecting the document.  Inside noCopy() the object itself
+    is added instead, and the document takes ownership of it.  Avoiding the copies makes
+    building large documents much faster.
+    
+    Syntax:
+    
+        with noCopy():
+            d = Document()
+            for ...:
+                d.append(Placemark(...))
+    
+    An object added this way must not be added anywhere else.  Pass copy.deepcopy(x) where
+    the same object is meant to be used more than once.
+    """
+    global _copyObjects
+    previous = _copyObjects
+    _copyObjects = False
+    try:
+        yield
+    finally:
+        _copyObjects = previous
+
+def _related(valueType, attributeType):
+    # True if a value of valueType can be stored in an attribute of attributeType:
+    # either it is of that type, or the two share a kml3 base other than KMLObject.
+    if valueType is attributeType:
+        return True
+    bases = getmro(attributeType)
+    return any(x in bases for x in getmro(valueType) if x.__module__ == __name__ and x.__name__ != 'KMLObject')
 
-        super().__init__(self.__permittedAttributes, **kwargs)
-        
-    def __str__(self):
-        return super().__str__()
+# Set to False by trusted()
+_validateValues = True
 
-class ATOMLink(KMLObject):
-    # atom:link is a special case.  It has the link value inside the tag.  No other attributes permitted
-    def __init__(self, value):
-        # String value must be given on creation
-        super().__init__(['value'])
-        self.value = value
+@_contextmanager
+def trusted():
+    """
+    Stops values being validated as they are assigned to an attribute or added to a
+    container, for data that has already been checked.
     
-    def __str__(self):
-        return self.indent + '<atom:link href="{}" />\n'.format(self.value)
+    Inside trusted() a value that is already of the attribute's type is stored as it is,
+    and a plain number is stored as the attribute's number type without its range being
+    checked.  Other values are converted as usual.  Containers do not check the types of
+    new members, and ColumnContainers do not check their columns.
     
-class ATOMAuthor(KMLObject):
-    def __init__(self, name):
-        # String value must be given on creation
-        super().__init__(['name'])
-        self.name = name
+    Syntax:
     
-    def __str__(self):
-        tmp = self.indent + '<atom:author>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</atom:author>\n'
-        return tmp
-
-class XALAddress(KMLObject):
-    def __init__(self, address):
-        # String value must be given on creation
-        super().__init__(['adress'])
-        self.address = address
+        with trusted():
+            d = Document()
+            for ...:
+                d.append(Placemark(...))
+        d.validate()
     
-    def __str__(self):
-        return self.indent + '<xal:AddressDetails>{}</xal:AddressDetails>\n'.format(self.address)
-
-class Snippet(KMLObject):
-    def __init__(self, **kwargs):
-        super().__init__(['text','maxLines'], **kwargs)
-        
-    def __str__(self):
-        if not self.checkAttributes(['text']):
-            return ''
-        else:
-            tmp = self.indent + '<Snippet'
-            if 'maxLines' in self.__dict__:
-                tmp += ' maxLines="{}"'.format(self.maxLines)
-            tmp += '>{}</Snippet>\n'.format(self.text)
-            return tmp
-        
-class TimePrimitive(KMLObject):
+    Nothing stops bad values being stored, so call validate() on the result if the data
+    may not be valid.
     """
-    Abstract class that returns a TimeStamp or TimeSpan object depending on the number of values given.
+    global _validateValues
+    previous = _validateValues
+    _validateValues = False
+    try:
+        yield
+    finally:
+        _validateValues = previous
+
+# Set to True by cached()
+_cacheOutput = False
+
+# Kept in place of the output of an object that has none, but holds objects that may.
+# See KMLObject._dropOutput().
+_outputBelow = ('below', (), -1)
+
+@_contextmanager
+def cached():
+    """
+    Makes objects keep the output they render, so that writing a document again only
+    renders the objects that have changed since it was last written.
     
-    If one value is given, a TimeStamp object is returned.
-    If two (or more) values are given, a TimeSpan object is returned.  The first value will be 'begin' and
-    the second value will be 'end'
+    Use it for a document that is saved again and again with small changes.  The kept
+    output holds the text of the whole document, so a large document written once is
+    better written without it, which is the default.
     
-    Options can be passed as a string (for one option), list or tuple (for two or more)
+    Syntax:
     
-    Only the first two values will be used.  Any other values in the list or tuple will be ignored.
+        with cached():
+            x.save('out.kml')
+            ...
+            x.save('out.kml')
     
-    All values must be valid DateTime values.
+    Output kept is used wherever the object is next written, inside cached() or not, until
+    it changes.  Changes made through attributes and container methods, and changes to a
+    Color or KMLDateTime in place, are all noticed.
+    """
+    global _cacheOutput
+    previous = _cacheOutput
+    _cacheOutput = True
+    try:
+        yield
+    finally:
+        _cacheOutput = previous
+
+# Counts changes made in place to values such as Color and KMLDateTime, which do not know
+# the objects that hold them.  Output rendered before the last such change is not used.
+_valueEdits = 0
+
+def _valueEdited():
+    global _valueEdits
+    _valueEdits += 1
+
+# Instrumentation hooks, called as hook(event, obj, *args).  See addHook().
+_hooks = []
+
+def _emit(event, obj, *args):
+    for hook in tuple(_hooks):
+        hook(event, obj, *args)
+
+def addHook(hook):
+    """
+    Registers a function to be called on construction and serialization events.
     
-    Usage:
+    Syntax:
     
-        x = TimePrimitive('2006')             # returns TimeStamp with <when> = '2006'
-        x = TimePrimitive(['2006','2007'])    # returns TimeSpan with <begin> = '2006' and <end> = '2007'
-        x = TimePrimitive(['2006',None])      # returns TimeSpan with <begin> = '2006' and no <end>
+        addHook(hook)
     
-        f = KMLFeature()
-        f.time = '2006'                       # f.time is TimeStamp with <when> = '2006'
-        f.time = '2006', '2007'               # f.time is TimeSpan with <begin> = '2006' and <end> = '2007'
+    The hook is called as hook(event, obj, *args), where event is one of:
+    
+        'create'            : obj has been created
+        'set'               : attribute args[0] of obj has been set to args[1]
+        'serializeStart'    : obj, a KML document, is about to be serialized
+        'serializeEnd'      : obj has been serialized
+    
+    While no hooks are registered, events cost a single test and nothing is formatted.
     """
-    def __new__(self, arg, gx = False):
-        if type(arg) in [TimeSpan, TimeStamp, GXTimeSpan, GXTimeStamp]:
-            return arg
-        if type(arg) is str:
-            if gx:
-                return GXTimeStamp(arg)
-            else:
-                return TimeStamp(arg)
-        if type(arg) is list:
-            arg = tuple(arg)
-        if len(arg) == 1:
+    _hooks.append(hook)
+
+def removeHook(hook):
+    """
+    Unregisters a hook added by addHook().
+    
+    Errors:
+    
+        ValueError if hook is not registered
+    """
+    _hooks.remove(hook)
+
+def logHook(event, obj, *args):
+    """
+    Hook that logs each event to the kml3 logger at DEBUG level.
+    
+    Syntax:
+    
+        addHook(logHook)
+    """
+    if event == 'set':
+        logger.debug('Attribute {} of type {} set on {}'.format(args[0], type(args[1]).__name__, obj.__class__.__name__))
+    else:
+        logger.debug('{} {}'.format(obj.__class__.__name__, event))
+
+class KMLType(type):
+    """
+    Metaclass of all KML objects.  Builds each class with __slots__ rather than a
+    per-instance __dict__.
+    
+    A class is given a slot for every attribute of its schema that none of its bases
+    already has, in addition to any private names it lists in __slots__ itself.
+    
+    A class that sets __slots__ = () is abstract.  It adds no slots, and its attributes
+    are given slots by each of its subclasses instead.  Classes that are mixed in with
+    a Container must be abstract, as Python cannot combine two bases that both add slots.
+    
+    A class that writes an element of its own sets _tag to the element's name, unless
+    it is the class name.  Subclasses that do not write their own inherit it.
+    """
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        if '_chunks' in namespace:
+            namespace.setdefault('_tag', name)
+        slots = namespace.get('__slots__')
+        namespace['_abstract'] = slots is not None and len(slots) == 0
+        if not namespace['_abstract']:
+            names = list(namespace.get('_attributes', []))
+            for b in bases:
+                names += getattr(b, '_order', [])
+            slots = list(slots or []) + [n for n in dict.fromkeys(names) if not any(hasattr(b, n) for b in bases)]
+            namespace['__slots__'] = tuple(slots)
+        cls = super().__new__(mcls, name, bases, namespace, **kwargs)
+        cls._freeze()
+        return cls
+
+class KMLObject(object, metaclass = KMLType):
+    # Attributes each class adds to those of its bases.  The combined schema (permitted
+    # names, their types and output order) is built once per class by _freeze() and shared
+    # by every instance.
+    _attributes = ['id']
+    # Every object knows the object that holds it, and inside cached() keeps the output it
+    # last rendered as (depth, chunks, value edits), with a depth of None for output
+    # without line breaks, or _outputBelow.  See _render() and invalidate().
+    __slots__ = ('__parent', '__cache')
+    # Set on classes that keep an index of what is below them, which is dropped with
+    # _dropIndex() when features are added, removed or moved below them
+    _indexes = False
+    # Set on classes that hold positions, so that a change to one, or to anything in it,
+    # moves features.  See _invalidate().
+    _positions = False
+
+    def __init__(self, **kwargs):
+        if self._abstract:
+            raise TypeError('Cannot create abstract object {}'.format(self.__class__.__name__))
+        object.__setattr__(self, '_KMLObject__parent', None)
+        object.__setattr__(self, '_KMLObject__cache', None)
+        # Attributes that have not been set read as None
+        for a in self._fields:
+            object.__setattr__(self, a, None)
+        
+        for k in kwargs:
+            setattr(self, k, kwargs[k])
+        
+        if _hooks: _emit('create', self)
+    
+    @classmethod
+    def _freeze(cls):
+        # Subclass attributes come before those of their bases.  A class can declare its
+        # base's attributes itself to have them output first.
+        order = []
+        for c in cls.__mro__:
+            for a in c.__dict__.get('_attributes', []):
+                if a not in order:
+                    order.append(a)
+        types = globals().get('attributeTypes', {})
+        cls._permitted = frozenset(order)
+        cls._order = tuple(order)
+        cls._types = {a: types[a] for a in order if a in types}
+        # Attributes that trusted() can store without conversion
+        cls._numbers = frozenset(a for a, t in cls._types.items() if number in getmro(t))
+        # How values are stored, keyed on (attribute name, value type).  See _resolve().
+        cls._dispatch = {}
+        # Attributes held in slots, leaving out any that are properties
+        cls._fields = tuple(a for a in order if not isinstance(getattr(cls, a, None), property))
+        # Attributes that can hold an object.  Values of other types are converted to their
+        # type when set.
+        cls._objects = tuple(a for a in cls._fields if a not in cls._types or isinstance(cls._types[a], KMLType))
+        # Every slot, private ones included, for copying.  The parent and cached output
+        # belong to this copy of the object only.
+        cls._slots = tuple(n for c in cls.__mro__ for n, v in c.__dict__.items() 
+                           if type(v) is _MemberDescriptorType and not n.startswith('_KMLObject__'))
+        # Members of unique containers have a key.  See Container._rekey().
+        cls._keyed = hasattr(cls, '_key')
+    
+    def __getattr__(self, name):
+        # Only called when normal lookup fails.  Every supported attribute has a slot, so
+        # only unsupported names and unset private slots get here.
+        if '__' in name:
+            raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+        raise AttributeError('Attribute {} not supported by object {}'.format(name, self.__class__.__name__))
+    
+    def __deepcopy__(self, memo):
+        obj = type(self).__new__(type(self))
+        memo[id(self)] = obj
+        object.__setattr__(obj, '_KMLObject__parent', None)
+        object.__setattr__(obj, '_KMLObject__cache', None)
+        for n in self._slots:
+            try:
+                value = object.__getattribute__(self, n)
+            except AttributeError:
+                continue
+            # Strings, numbers and enums are immutable, so the copy can share them
+            if value is not None and not isinstance(value, (str, int, float, Enum)):
+                value = obj._adopt(deepcopy(value, memo))
+            object.__setattr__(obj, n, value)
+        return obj
+    
+    def __getstate__(self):
+        # Leaves out the parent, so pickling an object does not pickle what holds it
+        slots = {}
+        for n in self._slots:
+            try:
+                slots[n] = object.__getattribute__(self, n)
+            except AttributeError:
+                pass
+        return None, slots
+    
+    def __setstate__(self, state):
+        # Used by pickle.  The state has already been validated, so it is restored
+        # straight into the slots.
+        state, slots = state if type(state) is tuple else (state, None)
+        object.__setattr__(self, '_KMLObject__parent', None)
+        object.__setattr__(self, '_KMLObject__cache', None)
+        for k, v in list((state or {}).items()) + list((slots or {}).items()):
+            object.__setattr__(self, k, v)
+        for child in self._children():
+            object.__setattr__(child, '_KMLObject__parent', self)
+    
+    def _children(self):
+        # Objects held directly by this one
+        for a in self._objects:
+            value = object.__getattribute__(self, a)
+            if isinstance(value, KMLObject):
+                yield value
+    
+    def _rekey(self, member, key):
+        # Told by member, which this object holds, that its key may have changed from key.
+        # Only unique containers need to know.
+        pass
+    
+    def _adopt(self, value):
+        # Records that value, if it is an object, is now held by this one.  Its output may
+        # depend on settings inherited from what held it before, such as the precision.
+        if isinstance(value, KMLObject):
+            if value.__cache is not None and value.__parent is not self:
+                value._dropOutput()
+            object.__setattr__(value, '_KMLObject__parent', self)
+        return value
+    
+    def _inherited(self, name):
+        # Value of a setting, such as precision, from this object or the nearest object
+        # holding it that has the setting
+        node = self
+        while node is not None:
+            if name in node._permitted:
+                value = object.__getattribute__(node, name)
+                if value is not None:
+                    return value
+            node = node.__parent
+        return None
+    
+    def _depth(self):
+        # Depth this object is written at when what ultimately holds it is written: the
+        # number of objects above it
+        depth = 0
+        node = self.__parent
+        while node is not None:
+            depth += 1
+            node = node.__parent
+        return depth
+    
+    def _dropOutput(self):
+        # Discards the cached output of this object and of everything it holds.  An object
+        # with no output of its own keeps _outputBelow while anything it holds may have
+        # some, so objects holding none are not searched.
+        stack = [self]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.__cache is not None:
+                object.__setattr__(node, '_KMLObject__cache', None)
+                stack.extend(node._children())
+    
+    def _invalidateAll(self):
+        # Discards the cached output of this object, of everything it holds and of
+        # everything holding it.  Used when a setting inherited by the objects below changes.
+        self._dropOutput()
+        self.invalidate()
+    
+    def invalidate(self):
+        """
+        Discards the cached output of the object and of every object that holds it.
+        
+        Changes made through attributes and container methods, and to a Color or
+        KMLDateTime in place, do this automatically.  Call it after changing a column
+        returned by ColumnContainer.columns() in place.  As the change may have moved
+        features, the indexes of the Folders and Documents holding the object are
+        dropped as well.
+        
+        Syntax:
+        
+            x.invalidate()
+        """
+        self._invalidate(True)
+    
+    def _invalidate(self, moved):
+        # Discards the cached output of this object and of every object that holds it.
+        # Indexes above are only dropped if moved is True, or the change is inside an
+        # object that holds positions, so that renaming a Placemark keeps them.
+        node = self
+        while node is not None:
+            if node.__cache is not None:
+                object.__setattr__(node, '_KMLObject__cache', _outputBelow)
+            moved = moved or node._positions
+            if moved and node._indexes:
+                node._dropIndex()
+            node = node.__parent
+
+    @classmethod
+    def _resolve(cls, name, valueType):
+        # Works out how a value of valueType is stored in attribute name.  Returns a tuple
+        # of (copy, convert, numberType): whether the value is an object to be cloned,
+        # a function that converts it to the attribute's type (None to store it as it is)
+        # and the attribute's type if it is a number, for trusted().
+        if name not in cls._permitted:
+            raise AttributeError('Attribute {} not supported by object {}'.format(name, cls.__name__))
+        
+        if name not in cls._types:
+            raise RuntimeError('Type for attribute {} not defined'.format(name))
+        attributeType = cls._types[name]
+        
+        copy = KMLObject in getmro(valueType)
+        numberType = attributeType if name in cls._numbers else None
+        
+        # Value is already of the correct type, or of a derived type
+        if _related(valueType, attributeType):
+            return copy, None, None
+        
+        # See if the attribute expects an Enum
+        if Enum in getmro(attributeType):
+            if valueType is int:
+                return copy, lambda v: attributeType(v), None        # Set Enum by integer value
+            # Strings may hold either the integer value or the name
+            return copy, lambda v: attributeType(int(v)) if number.isInt(v) else attributeType[v], None
+        
+        # Check for object of incorrect type
+        if copy:
+            raise TypeError('Incorrect object type for {}.  Expected {}, given {}'.format(name, attributeType.__name__, valueType.__name__))
+        
+        # Otherwise create a new instance using value as an init argument
+        return copy, attributeType, numberType
+
+    def __setattr__(self, name, value):
+        if '__' in name:
+            super().__setattr__(name, value)
+            return
+        
+        # Repeated assignments of the same type take a single lookup
+        try:
+            copy, convert, numberType = self._dispatch[name, value.__class__]
+        except KeyError:
+            copy, convert, numberType = self._dispatch[name, value.__class__] = self._resolve(name, value.__class__)
+
+        # If an object is passed, clone it first unless noCopy() is in effect
+        if copy:
+            if _copyObjects:
+                value = deepcopy(value)
+            elif value.__cache is not None and value.__parent is not self:
+                # Output rendered under another parent may be wrong here.  See _adopt().
+                value._dropOutput()
+            object.__setattr__(value, '_KMLObject__parent', self)
+
+        if convert is not None:
+            # Inside trusted(), plain numbers are stored without their range being checked
+            if numberType is not None and not _validateValues:
+                value = float.__new__(numberType, value)
+            else:
+                value = convert(value)
+        if self._keyed and self.__parent is not None:
+            # A unique container indexes its members by key, so it is told of a new key.
+            # The value is put back if the key is already taken.
+            key, old = self._key, object.__getattribute__(self, name)
+            super().__setattr__(name, value)
+            try:
+                self.__parent._rekey(self, key)
+            except ValueError:
+                object.__setattr__(self, name, old)
+                raise
+        else:
+            super().__setattr__(name, value)
+        if name == 'precision':
+            self._invalidateAll()
+        elif self.__cache is not None or self.__parent is not None:
+            # Setting a geometry or coordinates moves a feature
+            self._invalidate(copy and value._positions)
+        if _hooks: _emit('set', self, name, value)
+    
+    def __str__(self):
+        return ''.join(self._render())
+
+    def _render(self, depth = 0, nl = '\n'):
+        # Yields the same chunks as _chunks(), keeping them so that the object is only
+        # rendered again once it, or something it holds, has changed.  Objects write their
+        # children with _render() so that unchanged children are reused.  Output without
+        # line breaks has no indentation either, so it is kept whatever the depth.
+        key = depth if nl else None
+        cache = self.__cache
+        if cache is not None and cache[0] == key and cache[2] == _valueEdits:
+            yield from cache[1]
+            return
+        if not _cacheOutput:
+            yield from self._chunks(depth, nl)
+            return
+        # The pending entry is cleared if the object changes while it is being rendered
+        edits = _valueEdits
+        pieces = []
+        pending = (-1, pieces, edits)
+        object.__setattr__(self, '_KMLObject__cache', pending)
+        node = self.__parent
+        while node is not None and node.__cache is None:
+            object.__setattr__(node, '_KMLObject__cache', _outputBelow)
+            node = node.__parent
+        for chunk in self._chunks(depth, nl):
+            pieces.append(chunk)
+            yield chunk
+        if self.__cache is pending:
+            object.__setattr__(self, '_KMLObject__cache', (key, pieces, edits))
+
+    def _compactText(self):
+        # The text of this object without indentation or line breaks, so it does not
+        # depend on where the object is written
+        return ''.join(self._render(0, ''))
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        # Generates the KML text of this object piece by piece so large documents can be
+        # written out without building the whole string in memory.  Subclasses wrap this
+        # with their own opening and closing tags.  depth is how deeply this object is
+        # nested in the document being written, and sets its indentation.  Children are
+        # written at depth + 1, through _render().  nl is the line break, which is empty
+        # for output without line breaks or indentation.
+        inner = _indent(depth + 1, nl)
+        for a in self._fields:                      # Cycle through the attributes in order
+            if a in ('id', 'precision'): continue   # Written as an XML attribute, or only controls the output
+            value = getattr(self, a)
+            if value is not None:
+                if KMLObject in getmro(value.__class__):              # Output the attribute if it has been set
+                    # Objects handle their own code formatting and indentation
+                    yield from value._render(depth + 1, nl)
+                else:
+                    # Simple attributes can be easily formatted
+                    # All enums should know how to return the proper value when requested.  See the __str__() of the respective enum.
+                    if a[:3] == 'gx_':
+                        yield inner + '<{}>{}</{}>'.format(a.replace('_',':'),value,a.replace('_',':')) + nl
+                    else:
+                        yield inner + '<{}>{}</{}>'.format(a,value,a) + nl
+    
+    @property
+    def getID(self):
+        if self.id is not None:
+            return ' id="{}"'.format(self.id)
+        else:
+            return ''
+    
+    def validate(self):
+        """
+        Checks every attribute of the object, and of every object it contains.
+        
+        Used to check objects built inside trusted().  Returns the object.
+        
+        Syntax:
+        
+            x.validate()
+        
+        Errors:
+        
+            TypeError       : an attribute or member is not of a permitted type
+            ValueError      : a number is out of range for its type
+        """
+        for name in self._fields:
+            value = object.__getattribute__(self, name)
+            if value is None:
+                continue
+            attributeType = self._types.get(name)
+            if attributeType is not None and not _related(value.__class__, attributeType):
+                # Factory types, such as TimePrimitive, hand back values they accept
+                try:
+                    valid = attributeType(value) is value
+                except (TypeError, ValueError, KeyError):
+                    valid = False
+                if not valid:
+                    raise TypeError('Incorrect type for {} of {}.  Expected {}, given {}'.format(name, self.__class__.__name__, attributeType.__name__, value.__class__.__name__))
+            if name in self._numbers:
+                try:
+                    attributeType(value)
+                except ValueError:
+                    raise ValueError('Value {} out of range for {} of {}'.format(value, name, self.__class__.__name__)) from None
+            elif isinstance(value, KMLObject):
+                value.validate()
+        return self
+    
+    def checkAttributes(self, attributes):
+        attr = True
+        for a in attributes:
+            if getattr(self, a) is None:
+                logger.warning('{} has missing required attribute {}. No tag returned.'.format(self.__class__.__name__, a))
+                attr = False
+        return attr
+        
+class altitudeMode(KMLObject):
+    # altitudeMode is slightly different as its the only enum that alters its tag based on its value
+    # Because of this, it behaves like an object rather than an attribute.
+    _attributes = ['altitudeModeEnum']
+
+    def __init__(self, value):
+        super().__init__()
+        self.altitudeModeEnum = altitudeModeEnum[value]
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        if self.altitudeModeEnum.value < 3:
+            yield indent + '<altitudeMode>{}</altitudeMode>'.format(self.altitudeModeEnum.name) + nl
+        else:
+            yield indent + '<gx:altitudeMode>{}</gx:altitudeMode>'.format(self.altitudeModeEnum.name) + nl
+        
+class Orientation(KMLObject):
+    _attributes = ['heading', 'tilt', 'roll']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Orientation>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Orientation>' + nl
+    
+class Location(KMLObject):
+    _attributes = ['longitude', 'latitude', 'altitude']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Location>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Location>' + nl
+    
+class KMLFeature(KMLObject):
+    # Abstract, as Folder and Document mix it in with Container
+    __slots__ = ()
+    _attributes = ['name', 'description', 'visibility', 'open', 'atom_link',
+                   'atom_author', 'address', 'xal_AddressDetails', 'phoneNumber',
+                   'Snippet', 'time', 'view', 'styleUrl', 'styleSelector',
+                   'region', 'extendedData']
+
+class ATOMLink(KMLObject):
+    # atom:link is a special case.  It has the link value inside the tag.  No other attributes permitted
+    _attributes = ['value']
+    _tag = 'atom:link'
+
+    def __init__(self, value):
+        # String value must be given on creation
+        super().__init__()
+        self.value = value
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<atom:link href="{}" />'.format(self.value) + nl
+    
+class ATOMAuthor(KMLObject):
+    _attributes = ['name']
+    _tag = 'atom:author'
+
+    def __init__(self, name):
+        # String value must be given on creation
+        super().__init__()
+        self.name = name
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<atom:author>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</atom:author>' + nl
+
+class XALAddress(KMLObject):
+    _attributes = ['adress']
+    _tag = 'xal:AddressDetails'
+
+    def __init__(self, address):
+        # String value must be given on creation
+        super().__init__()
+        self.address = address
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<xal:AddressDetails>{}</xal:AddressDetails>'.format(self.address) + nl
+
+class Snippet(KMLObject):
+    _attributes = ['text', 'maxLines']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        if not self.checkAttributes(['text']):
+            return
+        else:
+            yield indent + '<Snippet'
+            if self.maxLines is not None:
+                yield ' maxLines="{}"'.format(self.maxLines)
+            yield '>{}</Snippet>'.format(self.text) + nl
+        
+class TimePrimitive(KMLObject):
+    """
+    Abstract class that returns a TimeStamp or TimeSpan object depending on the number of values given.
+    
+    If one value is given, a TimeStamp object is returned.
+    If two (or more) values are given, a TimeSpan object is returned.  The first value will be 'begin' and
+    the second value will be 'end'
+    
+    Options can be passed as a string (for one option), list or tuple (for two or more)
+    
+    Only the first two values will be used.  Any other values in the list or tuple will be ignored.
+    
+    All values must be valid DateTime values.
+    
+    Usage:
+    
+        x = TimePrimitive('2006')             # returns TimeStamp with <when> = '2006'
+        x = TimePrimitive(['2006','2007'])    # returns TimeSpan with <begin> = '2006' and <end> = '2007'
+        x = TimePrimitive(['2006',None])      # returns TimeSpan with <begin> = '2006' and no <end>
+    
+        f = KMLFeature()
+        f.time = '2006'                       # f.time is TimeStamp with <when> = '2006'
+        f.time = '2006', '2007'               # f.time is TimeSpan with <begin> = '2006' and <end> = '2007'
+    """
+    def __new__(self, arg, gx = False):
+        if type(arg) in [TimeSpan, TimeStamp, GXTimeSpan, GXTimeStamp]:
+            return arg
+        if type(arg) is str:
+            if gx:
+                return GXTimeStamp(arg)
+            else:
+                return TimeStamp(arg)
+        if type(arg) is list:
+            arg = tuple(arg)
+        if len(arg) == 1:
             if gx:
                 return GXTimeStamp(arg[0])
             else:
@@ -924,54 +2070,62 @@ class TimePrimitive(KMLObject):
                 return TimeSpan(arg[0], arg[1])
 
 class TimeStamp(KMLObject):
+    _attributes = ['when']
+
     def __init__(self, value):
-        super().__init__(['when'])
+        super().__init__()
         self.when = value
     
-    def __str__(self):
-        tmp = self.indent + '<TimeStamp{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</TimeStamp>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<TimeStamp{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</TimeStamp>' + nl
 
 class GXTimeStamp(KMLObject):
+    _attributes = ['when']
+
     def __init__(self, value):
-        super().__init__(['when'])
+        super().__init__()
         self.when = value
     
-    def __str__(self):
-        tmp = self.indent + '<GXTimeStamp{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</GXTimeStamp>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<GXTimeStamp{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</GXTimeStamp>' + nl
         
 class TimeSpan(KMLObject):
+    _attributes = ['begin', 'end']
+
     def __init__(self, begin = None, end = None):
-        super().__init__(['begin', 'end'])
+        super().__init__()
         if begin is not None:
             self.begin = begin
         if end is not None:
             self.end = end
     
-    def __str__(self):
-        tmp = self.indent + '<TimeSpan{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</TimeSpan>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<TimeSpan{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</TimeSpan>' + nl
 
 class GXTimeSpan(KMLObject):
+    _attributes = ['begin', 'end']
+
     def __init__(self, begin = None, end = None):
-        super().__init__(['begin', 'end'])
+        super().__init__()
         if begin is not None:
             self.begin = begin
         if end is not None:
             self.end = end
     
-    def __str__(self):
-        tmp = self.indent + '<GXTimeSpan{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</GXTimeSpan>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<GXTimeSpan{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</GXTimeSpan>' + nl
 
 class Coordinate(KMLObject):
     """
@@ -988,73 +2142,124 @@ class Coordinate(KMLObject):
         alt             : (number) Altitude (optional)
         
     """
-    def __init__(self, **kwargs):
-        super().__init__(['longitude', 'latitude', 'altitude'], **kwargs)
+    _attributes = ['longitude', 'latitude', 'altitude']
 
     def __str__(self):
+        return self._format()
+    
+    def _format(self, precision = None):
+        # Values are rounded to precision decimal places if it is given
         if not self.checkAttributes(['latitude','longitude']):
             return ''
         else:
-            if 'altitude' in self.__dict__:
-                return '{},{},{}'.format(self.longitude, self.latitude, self.altitude)
-            else:
-                return '{},{}'.format(self.longitude, self.latitude)
+            values = [self.longitude, self.latitude]
+            if self.altitude is not None:
+                values.append(self.altitude)
+            return ','.join(_formatColumn(values, precision))
 
     def __eq__(self, x):
         if type(x) != type(self):         return False
         if self.latitude != x.latitude:   return FalSe
         if self.longitude != x.longitude: return FalSe
-        if hasattr(self, 'altitude') and hasattr(x, 'altitude'):
+        if self.altitude is not None and x.altitude is not None:
             if self.altitude != x.altitude : return False
         return True
            
-class Container(KMLObject, deque):
+class Container(KMLObject):
     """
     Creates a collection of objects.
     
+    Members are held in a list, so indexing is O(1).  appendleft(), popleft() and
+    rotate() are still supported, but take time in proportion to the length.
+    
     Usage:
     
-        x = Container(attributes, types, [unique])
+        x = Container(types, [unique])
+        x.append(value, [copy])
         
     Args:
     
-        attributes      : (list) List of additional attributes permitted on this object
         types           : (list) List of data types permitted in this collection.
                                  Parse an empty list for no restrictions.
         unique          : (bool) Control if duplicate objects are permitted.
-                                 Objects are compared via == (__eq__) method.
+                                 Objects are compared by their _key property.
                                  Optional - default is False (duplicates permitted)
+        copy            : (bool) Add a copy of value rather than value itself.
+                                 Optional - default is True.  Never copies inside noCopy()
+    
+    A unique container keeps an index of the position of each member by its _key, so
+    duplicate checks, index(), count() and 'in' do not have to search the members.  They
+    accept either a member or a key (such as a field name).  The index is built as
+    members are added, and follows a change to the key of a member.  Changing a key to
+    one another member has raises ValueError.
+    
+    precision sets the decimal places that coordinates in the container, or below it,
+    are rounded to on output.  It is not written itself.
     """
+    _attributes = ['precision']
+    __slots__ = ('__items', '__restrictTypes', '__validTypes', '__unique', '__keys')
     
-    def __init__(self, attributes, types, unique, **kwargs):
+    def __init__(self, types, unique, **kwargs):
+        self.__items = []
         
-        
-        # Add the class attributes we need for the deque object
-        super().__init__(attributes + ['append', 'appendleft', 'clear', 'count', 'index',
-                                       'insert', 'pop', 'popleft', 'reverse', 'rotate'], **kwargs)
+        super().__init__(**kwargs)
         # List of data types permitted in this collection
-        self.__restrictTypes = False
-        if len(types) > 0:
-            self.__validTypes = types
-            self.__restrictTypes = True
-        # Flag to permit duplicate entries.  Objects should override __eq__ to control comparison between objects
+        self.__validTypes = types
+        self.__restrictTypes = len(types) > 0
+        # Flag to permit duplicate entries.  Members of unique containers provide a _key property to compare by
         self.__unique = unique
+        # Position of each member by key, for unique containers
+        self.__keys = {}
     
     def __deepcopy__(self, memo):
-        obj = type(self)()
-        obj.__dict__.update(self.__dict__)
-        for o in range(len(self)):
-            obj.append(deepcopy(self[o]))
+        # Members are copied here so each can be given its new parent.  The keys are
+        # immutable and the list of valid types never changes, so neither is copied deeply.
+        memo[id(self.__validTypes)] = self.__validTypes
+        memo[id(self.__keys)] = dict(self.__keys)
+        memo[id(self.__items)] = items = []
+        obj = super().__deepcopy__(memo)
+        for item in self.__items:
+            items.append(obj._adopt(deepcopy(item, memo)))
         return obj
+    
+    def _keepRows(self, rows):
+        # Keeps only the members at the given positions, in the order given
+        self.__items = [self.__items[i] for i in rows]
+        self.__reindex()
+        self.__changed()
+    
+    def __changed(self):
+        # Members have been added, removed or moved.  The members of a Folder or Document
+        # are features, so the indexes above it are dropped too.
+        self._invalidate(self._indexes)
+    
+    def _children(self):
+        yield from super()._children()
+        for item in self.__items:
+            if isinstance(item, KMLObject):
+                yield item
+    
+    def __key(self, value):
+        # Members are looked up by their key.  Anything else is taken to be a key itself.
+        return value._key if isinstance(value, KMLObject) else value
+    
+    def _rekey(self, member, key):
+        # Called by a member after a value it holds has changed, with its key before
+        if not self.__unique or self.__keys.get(key) is None or self.__items[self.__keys[key]] is not member:
+            return
+        new = self.__key(member)
+        if new == key:
+            return
+        if new in self.__keys:
+            raise ValueError('Cannot duplicate {} when container {} unique is True'.format(member.__class__.__name__, self.__class__.__name__))
+        self.__keys[new] = self.__keys.pop(key)
+    
+    def __reindex(self):
+        # Called after members have been removed or moved
+        if self.__unique:
+            self.__keys = {self.__key(v): i for i, v in enumerate(self.__items)}
         
-    def __validateType(self, value):
-
-        # Allows all "add" methods to validate objects the same way
-        
-        # Clone the object first
-        value = deepcopy(value)
-
-        # Check for valid data types:
+    def __checkType(self, value):
         valid = False
         if self.__restrictTypes:
             # Direct type match
@@ -1069,58 +2274,502 @@ class Container(KMLObject, deque):
             # Raise an error on type mismatch
             if not valid:
                 raise TypeError('Type {} invalid for container {}'.format(value.__class__.__name__, self.__class__.__name__))
+    
+    def validate(self):
+        super().validate()
+        for item in self.__items:
+            self.__checkType(item)
+            if isinstance(item, KMLObject):
+                item.validate()
+        return self
+    
+    def __validateType(self, value, copy):
+
+        # Allows all "add" methods to validate objects the same way
+        
+        # Clone the object first
+        if copy and _copyObjects:
+            value = deepcopy(value)
+
+        # Check for valid data types, unless trusted() is in effect
+        if _validateValues:
+            self.__checkType(value)
         # Check if duplicates allowed 
         if self.__unique:
-            for i in range(len(self)):
-                if value == self[i]:
-                    # Raise error on duplicates when not allowed
-                    raise ValueError('Cannot duplicate {} when container {} unique is True'.format(value.__class__.__name__, self.__class__.__name__))
-        # On success, return the value that was passed to us with an increase to depth
-        value.depth = self.depth + 1
+            if self.__key(value) in self.__keys:
+                # Raise error on duplicates when not allowed
+                raise ValueError('Cannot duplicate {} when container {} unique is True'.format(value.__class__.__name__, self.__class__.__name__))
+        # On success, return the value that was passed to us
         return value
-                
-    def _set_depth(self, value):
-        super()._set_depth(value)
-        for a in range(len(self)):
-            self[a].depth = self.depth + 1
-    
-    def append(self, value):
-        value = self.__validateType(value)
-        super().append(value)
+    
+    def append(self, value, copy = True):
+        value = self._adopt(self.__validateType(value, copy))
+        self.__items.append(value)
+        if self.__unique:
+            self.__keys[self.__key(value)] = len(self.__items) - 1
+        self.__changed()
         return value
 
-    def appendleft(self, value):
-        value = self.__validateType(value)
-        super().appendleft(value)
+    def appendleft(self, value, copy = True):
+        return self.insert(0, value, copy)
+
+    def insert(self, index, value, copy = True):
+        value = self._adopt(self.__validateType(value, copy))
+        self.__items.insert(index, value)
+        self.__reindex()
+        self.__changed()
         return value
+    
+    def extend(self, values, copy = True):
+        for v in values:
+            self.append(v, copy)
+    
+    def extendleft(self, values, copy = True):
+        for v in values:
+            self.appendleft(v, copy)
+    
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+    
+    def __len__(self):
+        return len(self.__items)
+    
+    def __getitem__(self, index):
+        return self.__items[index]
+    
+    def __iter__(self):
+        return iter(self.__items)
+    
+    def __reversed__(self):
+        return reversed(self.__items)
+    
+    def __setitem__(self, index, value):
+        # Remove the old member first, so it can be replaced by one with the same key
+        if index < 0:
+            index += len(self)
+        old = self[index]
+        del self[index]
+        try:
+            self.insert(index, value)
+        except (TypeError, ValueError):
+            self.insert(index, old, copy = False)
+            raise
+    
+    def __delitem__(self, index):
+        del self.__items[index]
+        self.__reindex()
+        self.__changed()
+    
+    def pop(self, index = -1):
+        value = self.__items.pop(index)
+        if index == -1:
+            if self.__unique:
+                del self.__keys[self.__key(value)]
+        else:
+            self.__reindex()
+        self.__changed()
+        return value
+    
+    def popleft(self):
+        return self.pop(0)
+    
+    def remove(self, value):
+        del self[self.index(value)]
+    
+    def clear(self):
+        self.__items.clear()
+        self.__keys = {}
+        self.__changed()
+    
+    def rotate(self, n = 1):
+        if len(self.__items) > 0:
+            n %= len(self.__items)
+            self.__items[:] = self.__items[-n:] + self.__items[:-n]
+            self.__reindex()
+            self.__changed()
+    
+    def reverse(self):
+        self.__items.reverse()
+        self.__reindex()
+        self.__changed()
+    
+    def __contains__(self, value):
+        if self.__unique:
+            return self.__key(value) in self.__keys
+        return value in self.__items
+    
+    def index(self, value, *args):
+        if self.__unique and len(args) == 0:
+            if self.__key(value) not in self.__keys:
+                raise ValueError('{} is not in {}'.format(value, self.__class__.__name__))
+            return self.__keys[self.__key(value)]
+        return self.__items.index(value, *args)
+    
+    def count(self, value):
+        if self.__unique:
+            return int(self.__key(value) in self.__keys)
+        return self.__items.count(value)
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        yield from super()._chunks(depth, nl)
+        for item in self:
+            if KMLObject in getmro(item.__class__):
+                yield from item._render(depth + 1, nl)
+            else:
+                yield str(item)
 
-    def insert(self, index, value):
-        value = self.__validateType(value)
-        super().insert(index, value)
+class Coordinates(Container):
+    """
+    Collection of Coordinate objects, written as a <coordinates> element.
+    
+    Syntax:
+    
+        x = Coordinates([precision = digits])
+        x.append(Coordinate(...))
+    
+    Args:
+    
+        precision       : (int) Decimal places each value is rounded to on output.
+                                Optional - taken from the nearest container, Track or KML
+                                holding the coordinates, or every digit is written if
+                                none is set.
+    """
+    _tag = 'coordinates'
+    _positions = True
+    
+    def __init__(self, **kwargs):
+        super().__init__([Coordinate], False, **kwargs)
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        if len(self) == 0: return
+        precision = self._inherited('precision')
+        yield indent + '<coordinates>'
+        if len(self) == 1:
+            yield self[0]._format(precision) + '</coordinates>' + nl
+        else:
+            yield nl
+            yield from _joinLines(_indent(depth + 1, nl), [c._format(precision) for c in self], nl, ' ')
+            yield indent + '</coordinates>' + nl
+    
+    def _lonLat(self):
+        return [c.longitude for c in self], [c.latitude for c in self]
+    
+    def simplify(self, tolerance, minimum = 2):
+        """
+        Removes points that add little to the shape of the line, using the Douglas-Peucker
+        algorithm.
+        
+        Syntax:
+        
+            ratio = x.simplify(tolerance, [minimum])
+        
+        Args:
+        
+            tolerance       : (float) Largest distance in metres a removed point may be
+                                      from the simplified line
+            minimum         : (int) Fewest points to leave.  If simplifying would leave
+                                    fewer, no points are removed.
+        
+        Returns the reduction ratio: the fraction of the points that were removed.
+        """
+        n = len(self)
+        keep = _simplify(*self._lonLat(), tolerance)
+        if len(keep) == n or len(keep) < minimum:
+            return 0.0
+        self._keepRows(keep)
+        return 1 - len(keep) / n
+
+class ColumnContainer(Container):
+    """
+    Container that stores its members column-wise.
+    
+    Rather than holding one object per member, each attribute of the member type is
+    kept in its own column: an array('d') for numeric attributes, or a list for anything
+    else.  Numeric columns are validated in bulk on the way in, and members are rebuilt
+    on demand when indexed.  Changing a rebuilt member does not change the container.
+    
+    Usage:
+    
+        x = ColumnContainer(itemType, fields, required, ...)
+        
+    Args:
+    
+        itemType        : (class) Type of object each row represents
+        fields          : (list) Attribute names of itemType kept as columns, in order
+        required        : (list) Fields that may not be missing
+        ...             : Remaining arguments are passed on to the next base class
+    
+    Missing numeric values are stored as NaN, missing values in other columns as None.
+    """
+    __slots__ = ('__itemType', '__fields', '__required', '__columns', '__formatted')
+    
+    def __init__(self, itemType, fields, required, *args, **kwargs):
+        self.__itemType = itemType
+        self.__fields = fields
+        self.__required = required
+        self.__columns = None
+        self.__formatted = None
+        super().__init__(*args, **kwargs)
+        self.__columns = [self.__newColumn(f, []) for f in self.__fields]
+    
+    def __numeric(self, field):
+        return float in getmro(attributeTypes[field])
+    
+    def __newColumn(self, field, values):
+        # Build a validated column for one field from any iterable of values
+        if self.__numeric(field):
+            column = _floatArray(values)
+        else:
+            t = attributeTypes[field]
+            column = [v if v is None or type(v) is t else t(v) for v in values]
+        if _validateValues:
+            self.__checkColumn(field, column)
+        return column
+    
+    def __checkColumn(self, field, column):
+        if self.__numeric(field):
+            _checkRange(column, attributeTypes[field])
+            if field in self.__required and any(v != v for v in column):
+                raise ValueError('{} cannot have missing values in {}'.format(field, self.__class__.__name__))
+        elif field in self.__required and None in column:
+            raise ValueError('{} cannot have missing values in {}'.format(field, self.__class__.__name__))
+    
+    def validate(self):
+        # Columns are checked in bulk rather than by rebuilding every member
+        KMLObject.validate(self)
+        for f, c in zip(self.__fields, self.__columns):
+            self.__checkColumn(f, c)
+        return self
+    
+    def __copy(self, columns):
+        # Deep copy with the columns replaced by those given
+        x = KMLObject.__deepcopy__(self, {id(self.__columns): columns})
+        x.__formatted = None
+        return x
+    
+    def __changed(self):
+        # Rows have been changed, removed or moved, so lines already formatted are wrong
+        self.invalidate()
+    
+    def invalidate(self):
+        # Also forgets the lines formatted by _formatted(), as a column may have been
+        # changed in place
+        self.__formatted = None
+        super().invalidate()
+    
+    def _formatted(self, indent, nl, key, lines):
+        """
+        Returns the output lines of the rows, joined into blocks by _joinLines().
+        
+        lines(start) returns the lines of the rows from start on, without indent, and nl
+        is the line break.  key is anything else the lines depend on, such as the
+        precision.  Inside cached(), the blocks are kept, and while rows are only added to
+        the end, only the new rows are formatted next time.
+        """
+        formatted = self.__formatted
+        if formatted is None or formatted[0] != (indent, nl, key) or formatted[1] > len(self):
+            formatted = ((indent, nl, key), 0, [])
+        rows, blocks = formatted[1:]
+        if rows < len(self):
+            if not _cacheOutput:
+                blocks = blocks[:]
+            blocks.extend(_joinLines(indent, lines(rows), nl))
+            if _cacheOutput:
+                self.__formatted = ((indent, nl, key), len(self), blocks)
+        return blocks
+    
+    def __deepcopy__(self, memo):
+        return self.__copy([c[:] for c in self.__columns])
+    
+    def extend(self, *columns):
+        """
+        Appends many rows at once, given one iterable per field in field order.
+        
+        Trailing fields may be left out, or given as None, to mark them missing on every
+        row.  All columns are checked before any are stored.
+        """
+        length = None
+        new = []
+        for i, f in enumerate(self.__fields):
+            values = columns[i] if i < len(columns) else None
+            if values is None:
+                new.append(None)
+                continue
+            new.append(self.__newColumn(f, values))
+            if length is None:
+                length = len(new[-1])
+            elif length != len(new[-1]):
+                raise ValueError('Columns of {} must be the same length'.format(self.__class__.__name__))
+        if length is None:
+            return
+        for i, f in enumerate(self.__fields):
+            if new[i] is None:
+                new[i] = self.__newColumn(f, [None] * length)
+            self.__columns[i].extend(new[i])
+        # Rows already formatted are still right when rows are only appended
+        super().invalidate()
+    
+    def columns(self):
+        """
+        Returns the columns in field order.  Missing numeric values are NaN.
+        """
+        return tuple(self.__columns)
+    
+    def _keepRows(self, rows):
+        self.__columns = [_array('d', map(c.__getitem__, rows)) if type(c) is _array else list(map(c.__getitem__, rows))
+                          for c in self.__columns]
+        self.__changed()
+    
+    def __row(self, value):
+        # Split a member object or a sequence into one value per field
+        if type(value) in [list, tuple]:
+            return list(value) + [None] * (len(self.__fields) - len(value))
+        return [getattr(value, f, None) for f in self.__fields]
+    
+    # copy is accepted for compatibility with Container.  Rows are always stored by value.
+    def append(self, value, copy = True):
+        self.extend(*[[v] for v in self.__row(value)])
+        return value
+    
+    def appendleft(self, value, copy = True):
+        self.insert(0, value)
         return value
     
-    def __str__(self):
-        tmp = ''
-        tmp += super().__str__()
-        for i in range(len(self)):
-            tmp += str(self[i])
-        return tmp
+    def insert(self, index, value, copy = True):
+        row = self.__row(value)
+        for i, f in enumerate(self.__fields):
+            self.__columns[i].insert(index, self.__newColumn(f, [row[i]])[0])
+        self.__changed()
+        return value
+    
+    def pop(self, index = -1):
+        value = self[index]
+        del self[index]
+        return value
+    
+    def popleft(self):
+        return self.pop(0)
+    
+    def clear(self):
+        for c in self.__columns:
+            del c[:]
+        self.__changed()
+    
+    def reverse(self):
+        for c in self.__columns:
+            c.reverse()
+        self.__changed()
+    
+    def __len__(self):
+        return len(self.__columns[0]) if self.__columns else 0
+    
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return self.__copy([c[index] for c in self.__columns])
+        values = {}
+        for f, c in zip(self.__fields, self.__columns):
+            v = c[index]
+            if v is not None and v == v:
+                values[f] = v
+        return self.__itemType(**values)
+    
+    def __delitem__(self, index):
+        for c in self.__columns:
+            del c[index]
+        self.__changed()
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self[i]
+    
+    def rotate(self, n = 1):
+        if len(self) > 0:
+            n %= len(self)
+            for c in self.__columns:
+                c[:] = c[-n:] + c[:-n]
+            self.__changed()
+    
+    # Rows are rebuilt for comparison, so these are linear scans
+    def __contains__(self, value):
+        return any(v == value for v in self)
+    
+    def index(self, value, start = 0, stop = None):
+        for i in range(*slice(start, stop).indices(len(self))):
+            if self[i] == value:
+                return i
+        raise ValueError('{} is not in {}'.format(value, self.__class__.__name__))
+    
+    def count(self, value):
+        return sum(1 for v in self if v == value)
 
-class Coordinates(Container):
-    def __init__(self):
-        super().__init__([],[Coordinate], False)
+class CoordinateArray(ColumnContainer, Coordinates):
+    """
+    Columnar Coordinates collection.
     
-    def __str__(self):
-        if len(self) == 0: return ''
-        tmp = self.indent + '<coordinates>'
+    Longitude, latitude and altitude are held in three array('d') columns rather than as
+    one Coordinate object per point.  Values are validated in bulk and written straight
+    from the arrays.  A CoordinateArray can be used anywhere Coordinates is accepted.
+    
+    Syntax:
+    
+        x = CoordinateArray()
+        x = CoordinateArray(longitudes, latitudes, [altitudes], [precision = digits])
+        x.append(Coordinate(longitude = lon, latitude = lat, [altitude = alt]))
+        x.append((lon, lat, [alt]))
+        x.extend(longitudes, latitudes, [altitudes])
+    
+    Args:
+    
+        longitudes      : (iterable) Longitude of each point (angle180)
+        latitudes       : (iterable) Latitude of each point (angle90)
+        altitudes       : (iterable) Altitude of each point (optional)
+        precision       : (int) Decimal places each value is rounded to on output
+                                (optional).  See Coordinates.
+    
+    Missing altitudes are stored as NaN and left out of the output.
+    
+    Errors:
+    
+        ValueError      : columns are of different lengths
+        ValueError      : a longitude or latitude is out of range or missing
+    """
+    _tag = 'coordinates'
+    
+    def __init__(self, longitudes = (), latitudes = (), altitudes = None, **kwargs):
+        super().__init__(Coordinate, ['longitude', 'latitude', 'altitude'], ['longitude', 'latitude'], **kwargs)
+        self.extend(longitudes, latitudes, altitudes)
+    
+    def _lonLat(self):
+        return self.columns()[:2]
+    
+    def __points(self):
+        # Format every point straight from the columns
+        precision = self._inherited('precision')
+        lons, lats, alts = self.columns()
+        text = [_formatColumn(c, precision) for c in (lons, lats, alts)]
+        missing = [a != a for a in alts]
+        if not any(missing):
+            return list(map(','.join, zip(*text)))
+        if all(missing):
+            return list(map(','.join, zip(*text[:2])))
+        return [','.join(p[:2] if m else p) for p, m in zip(zip(*text), missing)]
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        if len(self) == 0: return
+        yield indent + '<coordinates>'
         if len(self) == 1:
-            tmp += str(self[0]) + '</coordinates>\n'
+            yield self.__points()[0] + '</coordinates>' + nl
         else:
-            tmp += '\n'
-            for c in range(len(self)):
-                tmp += self.indent + ' ' + str(self[c]) + '\n'
-            tmp += self.indent + '</coordinates>\n'
-        return tmp
+            yield nl
+            yield from _joinLines(_indent(depth + 1, nl), self.__points(), nl, ' ')
+            yield indent + '</coordinates>' + nl
 
 class GXViewerOption(KMLObject):
     """
@@ -1137,14 +2786,22 @@ class GXViewerOption(KMLObject):
     
     Comparing GXViewerOption will only compare by name, not value. 
     """ 
+    _attributes = ['gx_optionName', 'enabled']
+    _tag = 'gx:option'
+
     def __init__(self, name, value = 1):
-        super().__init__(['gx_optionName','enabled'])
+        super().__init__()
         self.gx_optionName = name
         self.enabled = value
     
-    def __str__(self):
-        return self.indent + '<gx:option name="{}" enabled={}/>\n'.format(self.gx_optionName, self.enabled)
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:option name="{}" enabled={}/>'.format(self.gx_optionName, self.enabled) + nl
     
+    @property
+    def _key(self):
+        return str(self.gx_optionName)
+
     def __eq__(self, x):
         if type(x) is str:
             return self.gx_optionName == x
@@ -1160,16 +2817,18 @@ class GXViewerOptions(Container):
         x = GXViewerOptions()
         x.append(GXViewerOption(...))
     """
+    _tag = 'gx:ViewerOptions'
+    
     def __init__(self):
-        super().__init__(['seek'], [GXViewerOption], True)
+        super().__init__([GXViewerOption], True)
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if len(self) == 0:
-            return ''
-        tmp = self.indent + '<gx:ViewerOptions>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:ViewerOptions>\n'
-        return tmp
+            return
+        yield indent + '<gx:ViewerOptions>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:ViewerOptions>' + nl
 
     def seek(self, item):
         """
@@ -1185,147 +2844,139 @@ class GXViewerOptions(Container):
             x.seek('streetview').enabled = 'yes'
         """
         try:
-            return self[self.index(GXViewerOption(item))]
+            return self[self.index(item)]
         except ValueError:
             raise ValueError('GXViewerOption {} not found in GXViewerOptions'.format(item))
             
 class KMLView(KMLObject):
     # Inheritance placeholder class for all View types
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__permittedAttributes = ['longitude', 'latitude', 'altitude','altitudeMode', 'time',
-                                      'viewerOptions', 'heading', 'tilt'] + permittedAttributes
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'viewerOptions' not in self.__dict__:
+    # Subclasses list these first so they are output before their own attributes
+    _attributes = ['longitude', 'latitude', 'altitude','altitudeMode', 'time',
+                   'viewerOptions', 'heading', 'tilt']
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.viewerOptions is None:
             self.viewerOptions = GXViewerOptions()
         
 class Camera(KMLView):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['roll']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = KMLView._attributes + ['roll']
 
-    def __str__(self):
-        tmp = self.indent + '<Camera{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Camera>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Camera{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Camera>' + nl
                 
 class LookAt(KMLView):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['range']
-        super().__init__(self.__permittedAttributes, **kwargs)
-                
-    def __str__(self):
-        tmp = self.indent + '<LookAt{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</LookAt>\n'
-        return tmp
+    _attributes = KMLView._attributes + ['range']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<LookAt{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</LookAt>' + nl
         
 class Icon(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['href', 'gx_x', 'gx_y', 'gx_w', 'gx_h',
-                                      'refreshMode', 'refreshInterval',
-                                      'viewBoundScale', 'viewFormat',
-                                      'httpQuery'] 
-        super().__init__(self.__permittedAttributes, **kwargs)
-                
-    def __str__(self):
+    _attributes = ['href', 'gx_x', 'gx_y', 'gx_w', 'gx_h',
+                   'refreshMode', 'refreshInterval',
+                   'viewBoundScale', 'viewFormat',
+                   'httpQuery']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['href']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Icon{}>\n'.format(self.getID)
-            tmp += super().__str__()
-            tmp += self.indent + '</Icon>\n'
-            return tmp
+            yield indent + '<Icon{}>'.format(self.getID) + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Icon>' + nl
 
 class Vector(KMLObject):
-    def __init__(self, attributes, **kwargs):
-        super().__init__(attributes + ['x', 'y', 'xunits', 'yunits'], **kwargs)
+    # Inheritance placeholder for all x/y vector types.  The tag name is given by the subclass,
+    # which also sets it as _tag.
+    _attributes = ['x', 'y', 'xunits', 'yunits']
+    __slots__ = ('__tag',)
+
+    def __init__(self, tag, **kwargs):
+        self.__tag = tag
+        super().__init__(**kwargs)
     
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['x', 'y', 'xunits', 'yunits']):
-            return ''
+            yield indent + '<{} />'.format(self.__tag) + nl
         else:
-            return 'x="{}" y="{}" xunits="{}" yunits="{}"'.format(self.x, self.y, self.xunits, self.yunits)
+            yield indent + '<{} x="{}" y="{}" xunits="{}" yunits="{}"/>'.format(self.__tag, self.x, self.y, self.xunits, self.yunits) + nl
 
 class HotSpot(Vector):
+    _tag = 'hotSpot'
+
     def __init__(self, **kwargs):
-        super().__init__([], **kwargs)
-    
-    def __str__(self):
-        return self.indent + '<hotSpot {}/>\n'.format(super().__str__())
+        super().__init__(self._tag, **kwargs)
  
 class IconStyle(KMLObject):
-    def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['color', 'colorMode', 'scale', 'heading', 'icon', 'hotSpot']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['color', 'colorMode', 'scale', 'heading', 'icon', 'hotSpot']
 
-    def __str__(self):
-        tmp = self.indent + '<IconStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</IconStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<IconStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</IconStyle>' + nl
 
 class LabelStyle(KMLObject):
-    def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['color', 'colorMode', 'scale']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['color', 'colorMode', 'scale']
 
-    def __str__(self):
-        tmp = self.indent + '<LabelStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</LabelStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<LabelStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</LabelStyle>' + nl
 
 class LineStyle(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['color', 'colorMode', 'width', 'gx_outerColor', 'gx_outerWidth',
-                                      'gx_physicalWidth', 'gx_labelVisibility']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['color', 'colorMode', 'width', 'gx_outerColor', 'gx_outerWidth',
+                   'gx_physicalWidth', 'gx_labelVisibility']
 
-    def __str__(self):
-        tmp = self.indent + '<LineStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</LineStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<LineStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</LineStyle>' + nl
 
 class PolyStyle(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['color', 'colorMode', 'fill', 'outline']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['color', 'colorMode', 'fill', 'outline']
 
-    def __str__(self):
-        tmp = self.indent + '<PolyStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</PolyStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<PolyStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</PolyStyle>' + nl
 
 class BalloonStyle(KMLObject):
-    def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['bgColor', 'textColor', 'text', 'displayMode']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['bgColor', 'textColor', 'text', 'displayMode']
 
-    def __str__(self):
-        tmp = self.indent + '<BalloonStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</BalloonStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<BalloonStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</BalloonStyle>' + nl
 
 class ItemIcon(KMLObject):
-    def __init__(self, **kwargs):
-        super().__init__(['state', 'href'], **kwargs)
-    
-    def __str__(self):
+    _attributes = ['state', 'href']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['state','href']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<ItemIcon>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</ItemIcon>\n'
-            return tmp
+            yield indent + '<ItemIcon>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</ItemIcon>' + nl
     
+    @property
+    def _key(self):
+        return str(self.state)
+
     def __eq__(self, x):
         if type(x) is str:
             return self.state == x
@@ -1333,36 +2984,36 @@ class ItemIcon(KMLObject):
             return self.state == x.state
 
 class ListStyle(Container):
+    _attributes = ['listItemType', 'bgColor']
+
     def __init__(self, **kwargs):
-        super().__init__(['listItemType', 'bgColor'],[ItemIcon], True, **kwargs)
+        super().__init__([ItemIcon], True, **kwargs)
         
-    def __str__(self):
-        if len(self) == 0: return ''
-        tmp = self.indent + '<ListStyle{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</ListStyle>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        if len(self) == 0: return
+        yield indent + '<ListStyle{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</ListStyle>' + nl
 
 class StyleSelector(KMLObject):
     # Inheritance placeholder class for all geometry types
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__permittedAttributes = permittedAttributes
-        super().__init__(self.__permittedAttributes, **kwargs)
+    __slots__ = ()
 
 class Style(StyleSelector):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['IconStyle', 'LabelStyle', 'LineStyle',
-                                      'PolyStyle', 'BalloonStyle', 'ListStyle']
+    _attributes = ['IconStyle', 'LabelStyle', 'LineStyle',
+                   'PolyStyle', 'BalloonStyle', 'ListStyle']
 
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'ListStyle' not in self.__dict__:
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.ListStyle is None:
             self.ListStyle = ListStyle()
                 
-    def __str__(self):
-        tmp = self.indent + '<Style{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Style>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Style{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Style>' + nl
     
 class StyleMapPair(KMLObject):
     """
@@ -1379,18 +3030,22 @@ class StyleMapPair(KMLObject):
     
     Comparing StyleMapPair will only compare by key, not value. 
     """ 
-    def __init__(self, **kwargs):
-        super().__init__(['key','styleUrl'], **kwargs)
-        
-    def __str__(self):
+    _attributes = ['key', 'styleUrl']
+    _tag = 'Pair'
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['key','styleUrl']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Pair>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</Pair>\n'
-            return tmp
+            yield indent + '<Pair>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Pair>' + nl
     
+    @property
+    def _key(self):
+        return str(self.key)
+
     def __eq__(self, x):
         if type(x) is str:
             return self.key == x
@@ -1399,13 +3054,13 @@ class StyleMapPair(KMLObject):
 
 class StyleMap(Container, StyleSelector):
     def __init__(self):
-        super().__init__([], [StyleMapPair], True, **kwargs)
+        super().__init__([StyleMapPair], True, **kwargs)
     
-    def __str__(self):
-        tmp = self.indent + '<StyleMap{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</StileMap>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<StyleMap{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</StileMap>' + nl
 
     def seek(self, item):
         """
@@ -1421,99 +3076,98 @@ class StyleMap(Container, StyleSelector):
             x.seek('normal').styleUrl = '#MyStyle'
         """
         try:
-            return self[self.index(StyleMapPair(item))]
+            return self[self.index(item)]
         except ValueError:
             raise ValueError('StyleMapPair {} not found in StyleMap'.format(item))
             
 class LatLonAltBox(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['north', 'south', 'east', 'west', 'minAltitude', 'maxAltitude', 'altitudeMode']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['north', 'south', 'east', 'west', 'minAltitude', 'maxAltitude', 'altitudeMode']
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['north', 'south', 'east', 'west']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<LatLonAltBox>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</LatLonAltBox>\n'
-            return tmp
+            yield indent + '<LatLonAltBox>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</LatLonAltBox>' + nl
     
 class LatLonBox(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['north', 'south', 'east', 'west', 'rotation']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['north', 'south', 'east', 'west', 'rotation']
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['north', 'south', 'east', 'west']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<LatLonBox>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</LatLonBox>\n'
-            return tmp
+            yield indent + '<LatLonBox>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</LatLonBox>' + nl
     
 class LatLonQuad(KMLObject):
+    _attributes = ['coordinates']
+    _tag = 'gx:LatLonBox'
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['coordinates']
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'coordinates' not in self.__dict__:
+        super().__init__(**kwargs)
+        if self.coordinates is None:
             self.coordinates = Coordinates()
         
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if len(self.coordinates) < 4:
             logger.warning('LatLonQuad has less than four coordinate points set. Nothing returned')
-            return ''
+            return
         else:
-            tmp = self.indent + '<gx:LatLonBox>\n'
-            tmp += self.indent + ' <coordinates>{} {} {} {}</coordinates>\n'.format(self.coordinates[0],
-                                                                                    self.coordinates[1],
-                                                                                    self.coordinates[2],
-                                                                                    self.coordinates[3])
-            tmp += self.indent + '</gx:LatLonBox>\n'
-            return tmp
+            yield indent + '<gx:LatLonBox>' + nl
+            yield _indent(depth + 1, nl) + '<coordinates>{} {} {} {}</coordinates>'.format(self.coordinates[0],
+                                                                                           self.coordinates[1],
+                                                                                           self.coordinates[2],
+                                                                                           self.coordinates[3]) + nl
+            yield indent + '</gx:LatLonBox>' + nl
     
 class Lod(KMLObject):
-    def __init__(self, **kwargs):
-        super().__init__(['minLodPixels', 'maxLodPixels', 'minFadeExtent', 'maxFadeExtent'], **kwargs)
-    
-    def __str__(self):
+    _attributes = ['minLodPixels', 'maxLodPixels', 'minFadeExtent', 'maxFadeExtent']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['minLodPixels']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Lod>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</Lod>\n'
-            return tmp
+            yield indent + '<Lod>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Lod>' + nl
     
 class Region(KMLObject):
-    def __init__(self, **kwargs):
-        super().__init__(['LatLonAltBox', 'Lod'], **kwargs)
-        
-    def __str__(self):
+    _attributes = ['LatLonAltBox', 'Lod']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['LatLonAltBox']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Region{}>\n'.format(self.getID)
-            tmp += super().__str__()
-            tmp += self.indent + '</Region>\n'
-            return tmp
+            yield indent + '<Region{}>'.format(self.getID) + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Region>' + nl
 
 class SimpleField(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['name', 'type', 'displayName']
-        super().__init__(self.__permittedAttributes, **kwargs)
-    
-    def __str__(self):
+    _attributes = ['name', 'type', 'displayName']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        inner = _indent(depth + 1, nl)
         if not self.checkAttributes(['name','type']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<SimpleField type="{}" name="{}">\n'.format(self.type, self.name)
-            if 'displayName' in self.__dict__:
-                tmp += self.indent + ' <displayName>{}</displayName>\n'.format(self.displayName)
-            tmp += self.indent + '</SimpleField>\n'
-            return tmp
+            yield indent + '<SimpleField type="{}" name="{}">'.format(self.type, self.name) + nl
+            if self.displayName is not None:
+                yield inner + '<displayName>{}</displayName>'.format(self.displayName) + nl
+            yield indent + '</SimpleField>' + nl
     
+    @property
+    def _key(self):
+        return self.name
+
     def __eq__(self, x):
         if type(x) is str:
             return self.name == x
@@ -1521,20 +3175,24 @@ class SimpleField(KMLObject):
             return self.name == x.name
 
 class SimpleArrayField(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['name', 'type', 'displayName']
-        super().__init__(self.__permittedAttributes, **kwargs)
-    
-    def __str__(self):
+    _attributes = ['name', 'type', 'displayName']
+    _tag = 'gx:SimpleArrayField'
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        inner = _indent(depth + 1, nl)
         if not self.checkAttributes(['name','type']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<gx:SimpleArrayField type="{}" name="{}">\n'.format(self.type, self.name)
-            if 'displayName' in self.__dict__:
-                tmp += self.indent + ' <displayName>{}</displayName>\n'.format(self.displayName)
-            tmp += self.indent + '</gx:SimpleArrayField>\n'
-            return tmp
+            yield indent + '<gx:SimpleArrayField type="{}" name="{}">'.format(self.type, self.name) + nl
+            if self.displayName is not None:
+                yield inner + '<displayName>{}</displayName>'.format(self.displayName) + nl
+            yield indent + '</gx:SimpleArrayField>' + nl
     
+    @property
+    def _key(self):
+        return self.name
+
     def __eq__(self, x):
         if type(x) is str:
             return self.name == x
@@ -1542,18 +3200,20 @@ class SimpleArrayField(KMLObject):
             return self.name == x.name
 
 class Schema(Container):
+    _attributes = ['name', 'csvFile', 'csvparams']
+
     def __init__(self, **kwargs):
-        super().__init__(['name','loadFromCSV','csvFile','csvparams'], [SimpleField, SimpleArrayField], True, **kwargs)
+        super().__init__([SimpleField, SimpleArrayField], True, **kwargs)
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['name','id']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Schema name="{}"{}>\n'.format(self.name, self.getID)
-            for a in range(len(self)):
-                tmp += str(self[a])
-            tmp += self.indent + '</Schema>\n'
-            return tmp
+            yield indent + '<Schema name="{}"{}>'.format(self.name, self.getID) + nl
+            for item in self:
+                yield from item._render(depth + 1, nl)
+            yield indent + '</Schema>' + nl
     
     def loadFromCSV(self, file, fieldlist = [], **fmtparams):
         import csv
@@ -1565,21 +3225,24 @@ class Schema(Container):
         else:
             fields = headings
         for f in fields:
-            self.append(SimpleArrayField(name = f, type = 'string'))
+            self.append(SimpleArrayField(name = f, type = 'string'), copy = False)
         self.csvFile = file
         self.csvparams = fmtparams
     
 class SimpleData(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['name', 'value']
-        super().__init__(self.__permittedAttributes, **kwargs)
-    
-    def __str__(self):
+    _attributes = ['name', 'value']
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['name','value']):
-            return ''
+            return
         else:
-            return self.indent + '<SimpleData name="{}">{}</SimpleData>\n'.format(self.name, self.value)
+            yield indent + '<SimpleData name="{}">{}</SimpleData>'.format(self.name, self.value) + nl
     
+    @property
+    def _key(self):
+        return self.name
+
     def __eq__(self, x):
         if type(x) is str:
             return self.name == x
@@ -1587,89 +3250,108 @@ class SimpleData(KMLObject):
             return self.name == x.name
 
 class SchemaData(Container):
+    _attributes = ['schema', 'autoload']
+
     def __init__(self, **kwargs):
-        super().__init__(['schema', 'addData', 'loadCSV', 'autoload'], [SimpleData, SimpleArray], True, **kwargs)
+        super().__init__([SimpleData, SimpleArray], True, **kwargs)
         
         # Automatically create SimpleArray objects for each SimpleArrayField defined in the given schema
-        if 'schema' in self.__dict__:
-            for i in range(len(self.schema)):
-                if type(self.schema[i]) is SimpleArrayField:
-                    self.append(SimpleArray(name = self.schema[i].name))
+        if self.schema is not None:
+            for field in self.schema:
+                if type(field) is SimpleArrayField:
+                    self.append(SimpleArray(name = field.name), copy = False)
         
-        if 'autoload' in self.__dict__:
+        if self.autoload is not None:
             if self.autoload:
                 self.loadData()
     
     def loadCSV(self):
-        if 'schema' in self.__dict__:
-            if 'csvFile' in self.schema.__dict__:
-                import csv
-                fields = [x.name for x in self]
-                with open(self.schema.csvFile, newline = '') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    for row in reader:
-                        for i in range(len(self.schema)):
-                            self[i].append(SimpleArrayData(value = row[self[i].name]))
+        if self.schema is not None:
+            if self.schema.csvFile is not None:
+                arrays = [x for x in self if type(x) is SimpleArray]
+                fmtparams = self.schema.csvparams or {}
+                columns = _readColumns(self.schema.csvFile, [x.name for x in arrays], **fmtparams)
+                for a in arrays:
+                    a.extend(columns[a.name])
                         
         
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['schema']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<SchemaData schemaUrl="#{}">\n'.format(self.schema.id)
-            for a in range(len(self)):
-                tmp += str(self[a])
-            tmp += self.indent + '</SchemaData>\n'
-            return tmp
+            yield indent + '<SchemaData schemaUrl="#{}">'.format(self.schema.id) + nl
+            for item in self:
+                yield from item._render(depth + 1, nl)
+            yield indent + '</SchemaData>' + nl
 
     def addData(self, data):
         #load SchemaData object with data from a dict
         for d in data:
             if d in self.schema:
-                self.append(SimpleData(name = d, value = data[d]))
+                self.append(SimpleData(name = d, value = data[d]), copy = False)
 
-    def append(self, value):
+    def append(self, value, copy = True):
         if value.name in self.schema:
-            super().append(value)
+            return super().append(value, copy)
         else:
             raise KeyError('Field {} not found in schema {}'.format(value.name, self.schema.id))
 
-    def appendleft(self, value):
+    def appendleft(self, value, copy = True):
         if value.name in self.schema:
-            super().appendleft(value)
+            return super().appendleft(value, copy)
         else:
             raise KeyError('Field {} not found in schema {}'.format(value.name, self.schema.id))
 
-    def insert(self, index, value):
+    def insert(self, index, value, copy = True):
         if value.name in self.schema:
-            super().insert(index, value)
+            return super().insert(index, value, copy)
         else:
             raise KeyError('Field {} not found in schema {}'.format(value.name, self.schema.id))
         
 class SimpleArrayData(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['value']
-        super().__init__(self.__permittedAttributes, **kwargs)
-    
-    def __str__(self):
+    _attributes = ['value']
+    _tag = 'gx:value'
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['value']):
-            return ''
+            return
         else:
-            return self.indent + '<gx:value>{}</gx:value>\n'.format(self.value)
+            yield indent + '<gx:value>{}</gx:value>'.format(self.value) + nl
+
+class SimpleArray(ColumnContainer):
+    """
+    gx:SimpleArrayData for one field of a schema.
+    
+    Values are kept as a single column of strings rather than one SimpleArrayData object
+    each.  Both forms can be appended:
+    
+        x = SimpleArray(name = 'RPM')
+        x.append(SimpleArrayData(value = '845'))
+        x.extend(['845', '844', '850'])
+    """
+    _attributes = ['name']
+    _tag = 'gx:SimpleArrayData'
 
-class SimpleArray(Container):
     def __init__(self, **kwargs):
-        super().__init__(['name', 'addData'], [SimpleArrayData], False, **kwargs)
+        super().__init__(SimpleArrayData, ['value'], [], [SimpleArrayData], False, **kwargs)
     
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['name']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<gx:SimpleArrayData name="{}">\n'.format(self.name)
-            for a in range(len(self)):
-                tmp += str(self[a])
-            tmp += self.indent + '</gx:SimpleArrayData>\n'
-            return tmp
+            yield indent + '<gx:SimpleArrayData name="{}">'.format(self.name) + nl
+            yield from self._formatted(_indent(depth + 1, nl), nl, None, self.__lines)
+            yield indent + '</gx:SimpleArrayData>' + nl
+
+    def __lines(self, start):
+        return ['<gx:value>{}</gx:value>'.format(value) for value in self.columns()[0][start:] if value is not None]
+
+    @property
+    def _key(self):
+        return self.name
 
     def __eq__(self, x):
         if type(x) is str:
@@ -1678,57 +3360,55 @@ class SimpleArray(Container):
             return self.name == x.name
     
 class ExtendedData(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['schemaData']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['schemaData']
 
-    def __str__(self):
-        tmp = self.indent + '<ExtendedData>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</ExtendedData>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<ExtendedData>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</ExtendedData>' + nl
 
 class Link(KMLObject):
-    def __init__(self, href, **kwargs):
-        self.__permittedAttributes = ['href',
-                                      'refreshMode', 'refreshInterval',
-                                      'viewRefreshMode', 'viewRefreshTime',
-                                      'viewBoundScale', 'viewFormat',
-                                      'httpQuery'] 
+    _attributes = ['href',
+                   'refreshMode', 'refreshInterval',
+                   'viewRefreshMode', 'viewRefreshTime',
+                   'viewBoundScale', 'viewFormat',
+                   'httpQuery']
 
-        super().__init__(self.__permittedAttributes, **kwargs)
+    def __init__(self, href, **kwargs):
+        super().__init__(**kwargs)
                 
-    def __str__(self):
-        tmp = self.indent + '<Link{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Link>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Link{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Link>' + nl
 
 class Scale(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['x', 'y', 'z']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['x', 'y', 'z']
 
-    def __str__(self):
-        tmp = self.indent + '<Scale>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</Scale>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Scale>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Scale>' + nl
 
 class Alias(KMLObject):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = ['sourceHref', 'targetHref']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['sourceHref', 'targetHref']
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['sourceHref','targetHref']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Alias>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</Alias>\n'
-            return tmp
+            yield indent + '<Alias>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Alias>' + nl
     
+    @property
+    def _key(self):
+        return (self.sourceHref, self.targetHref)
+
     def __eq__(self, x):
         if self.sourceHref == x.sourceHref and \
            self.targetHref == x.targetHref:
@@ -1737,270 +3417,531 @@ class Alias(KMLObject):
 
 class ResourceMap(Container):
     def __init__(self):
-        super().__init__([], [Alias], True)
+        super().__init__([Alias], True)
         
-    def __str__(self):
-        tmp = self.indent + '<ResourceMap>\n'
-        for a in range(len(self)):
-            tmp += str(self[a])
-        tmp += self.indent + '</ResourceMap>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<ResourceMap>' + nl
+        for item in self:
+            yield from item._render(depth + 1, nl)
+        yield indent + '</ResourceMap>' + nl
+    
+class KMLContainer(Container):
+    """
+    Base class of Folder and Document, which can find the features they hold by location.
+    
+    Syntax:
+    
+        x.buildIndex([cellSize])
+        features = x.queryBBox(north, south, east, west)
+        features = x.queryRadius(latitude, longitude, metres)
+        features = x.nearest(latitude, longitude, [count])
+    
+    Args:
+    
+        cellSize        : (float) Cell size of the index in degrees.  If not given, it is
+                                  chosen so there are a few features in each cell.
+        north, south,
+        east, west      : (float) Edges of the box in degrees, in the order of a LatLonBox.
+                                  A box whose west edge is east of its east edge crosses
+                                  the antimeridian.
+        latitude,
+        longitude       : (float) Point to measure from, in degrees
+        metres          : (float) Distance from the point
+        count           : (int) Number of features to return
+    
+    Features are the members that are not Folders or Documents, and the members of the
+    Folders and Documents held, at any depth.  A feature is found by the bounding box of
+    every position it holds (see _bounds()), and features without a position are never
+    found.  queryBBox() and queryRadius() return features in document order, and
+    nearest() returns them nearest first.  Distances are measured over the surface of the
+    earth to the nearest point of the box, as by _distance().
+    
+    The features are kept in a GridIndex, which is built by the first query, or by
+    buildIndex().  Features appended to the container after that are added to the
+    index as they are appended.  Adding, removing or reordering the features in it or in
+    a Folder or Document it holds, or changing a geometry or coordinates below it, such
+    as by moving a Placemark, drops the index, and the next query builds it again.  Other
+    changes, such as renaming a Placemark or giving it a style, keep the index.  Calling
+    invalidate() drops it, as it follows changes made in place.  Containers that are
+    never queried keep no index.
+    """
+    # Abstract, see the end of the module
+    __slots__ = ('__index', '__cellSize')
+    _indexes = True
     
-class Folder(Container, KMLFeature):
-    def __init__(self, **kwargs):
-        self.__permittedAttributes = []
-
-        super().__init__(self.__permittedAttributes, [KMLObject], False, **kwargs)
-
-    def __str__(self):
-        tmp = self.indent + '<Folder{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '<Folder>\n'
-        return tmp
-
-class Document(Container, KMLFeature):
     def __init__(self, **kwargs):
-        self.__permittedAttributes = []
-
-        super().__init__(self.__permittedAttributes, [KMLObject], False, **kwargs)
-        
-    def __str__(self):
-        tmp = self.indent + '<Document{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '<Document>\n'
-        return tmp
+        self.__index = None
+        self.__cellSize = None
+        super().__init__([KMLObject], False, **kwargs)
+    
+    def __deepcopy__(self, memo):
+        # The copy builds its own index when it is first queried
+        memo[id(self.__index)] = None
+        return super().__deepcopy__(memo)
+    
+    def _dropIndex(self):
+        if self.__index is not None:
+            self.__index = None
+    
+    def __locate(self, member, located):
+        # Adds (feature, box) to located for member, or for each feature in it if it is a
+        # Folder or Document
+        if isinstance(member, KMLContainer):
+            for m in member:
+                self.__locate(m, located)
+        else:
+            box = _bounds(member)
+            if box is not None:
+                located.append((member, box))
+    
+    def append(self, value, copy = True):
+        index = self.__index
+        value = super().append(value, copy)
+        # Appending drops the index like any other change, but the new features can
+        # simply be added to it, as they come after every feature already in it
+        if index is not None:
+            located = []
+            self.__locate(value, located)
+            for feature, box in located:
+                index.insert(feature, *box)
+            self.__index = index
+        return value
+    
+    def buildIndex(self, cellSize = None):
+        """
+        Indexes the features in the container again, with cells of cellSize degrees.
+        The cell size is kept for when the index is next built by a query.
+        """
+        located = []
+        for member in self:
+            self.__locate(member, located)
+        self.__cellSize = cellSize
+        if cellSize is None:
+            cellSize = 1.0
+            if len(located) > 0:
+                west = min(b[0] for f, b in located)
+                south = min(b[1] for f, b in located)
+                east = max(b[2] for f, b in located)
+                north = max(b[3] for f, b in located)
+                area = (east - west) * (north - south)
+                if area > 0:
+                    cellSize = _sqrt(area * 4 / len(located))
+        index = GridIndex(cellSize)
+        for feature, box in located:
+            index.insert(feature, *box)
+        self.__index = index
+    
+    def __current(self):
+        # The index, built first if it was dropped
+        if self.__index is None:
+            self.buildIndex(self.__cellSize)
+        return self.__index
+    
+    def queryBBox(self, north, south, east, west):
+        return self.__current().query(west, south, east, north)
+    
+    def queryRadius(self, latitude, longitude, metres):
+        return self.__current().within(longitude, latitude, metres)
+    
+    def nearest(self, latitude, longitude, count = 1):
+        return self.__current().nearest(longitude, latitude, count)
+
+class Folder(KMLContainer, KMLFeature):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Folder{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Folder>' + nl
+
+class Document(KMLContainer, KMLFeature):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Document{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Document>' + nl
 
 class KMLGeometry(KMLObject):
     # Inheritance placeholder class for all geometry types
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__permittedAttributes = permittedAttributes
-        super().__init__(self.__permittedAttributes, **kwargs)
+    __slots__ = ()
+    _positions = True
 
 class Point(KMLGeometry):
+    _attributes = ['extrude', 'altitudeMode', 'coordinates']
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['extrude', 'altitudeMode', 'coordinates']
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'coordinates' not in self.__dict__:
+        super().__init__(**kwargs)
+        if self.coordinates is None:
             self.coordinates = Coordinates()
         
-    def __str__(self):
-        tmp = self.indent + '<Point{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Point>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Point{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Point>' + nl
 
 class LineString(KMLGeometry):
+    _attributes = ['gx_altitudeOffset', 'extrude', 'tessellate',
+                   'altitudeMode', 'gx_drawOrder', 'coordinates']
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['gx_altitudeOffset', 'extrude', 'tessellate',
-                                      'altitudeMode', 'gx_drawOrder', 'coordinates']
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'coordinates' not in self.__dict__:
+        super().__init__(**kwargs)
+        if self.coordinates is None:
             self.coordinates = Coordinates()
 
-    def __str__(self):
-        tmp = self.indent + '<LineString{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</LineString>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<LineString{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</LineString>' + nl
+    
+    def simplify(self, tolerance):
+        """
+        Simplifies the coordinates of the line.  See Coordinates.simplify().
+        """
+        return self.coordinates.simplify(tolerance)
 
 class LinearRing(KMLGeometry):
+    _attributes = ['gx_altitudeOffset', 'extrude', 'tessellate', 'altitudeMode', 'coordinates']
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['gx_altitudeOffset', 'extrude', 'tessellate', 'altitudeMode', 'coordinates']
-        super().__init__(self.__permittedAttributes, **kwargs)
-        if 'coordinates' not in self.__dict__:
+        super().__init__(**kwargs)
+        if self.coordinates is None:
             self.coordinates = Coordinates()
 
-    def __str__(self):
-        tmp = self.indent + '<LinearRing{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</LinearRing>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<LinearRing{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</LinearRing>' + nl
+    
+    def simplify(self, tolerance):
+        """
+        Simplifies the coordinates of the ring.  See Coordinates.simplify().
+        
+        A ring needs four points, the last the same as the first, so a ring that would
+        be left with fewer is not changed.
+        """
+        return self.coordinates.simplify(tolerance, minimum = 4)
 
 class OuterBoundary(KMLObject):
-    def __init__(self, **kwargs):
-                
-        self.__permittedAttributes = ['linearRing']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['linearRing']
+    _tag = 'outerBoundaryIs'
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['linearRing']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<outerBoundaryIs>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</outerBoundaryIs>\n'
-            return tmp
+            yield indent + '<outerBoundaryIs>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</outerBoundaryIs>' + nl
 
 class InnerBoundary(KMLObject):
-    def __init__(self, **kwargs):
-                
-        self.__permittedAttributes = ['linearRing']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['linearRing']
+    _tag = 'innerBoundaryIs'
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['linearRing']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<innerBoundaryIs>\n'
-            tmp += super().__str__()
-            tmp += self.indent + '</innerBoundaryIs>\n'
-            return tmp
+            yield indent + '<innerBoundaryIs>' + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</innerBoundaryIs>' + nl
 
 class Polygon(KMLGeometry):
-    def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['outerBoundaryIs', 'extrude', 'tessellate',
-                                      'altitudeMode', 'innerBoundaryIs']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['outerBoundaryIs', 'extrude', 'tessellate',
+                   'altitudeMode', 'innerBoundaryIs']
 
-    def __str__(self):
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['outerBoundaryIs']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<Polygon{}>\n'.format(self.getID)
-            tmp += super().__str__()
-            tmp += self.indent + '</Polygon>\n'
-            return tmp
+            yield indent + '<Polygon{}>'.format(self.getID) + nl
+            yield from super()._chunks(depth, nl)
+            yield indent + '</Polygon>' + nl
 
 class MultiGeometry(Container):
-    def __init__(self):
-        self.__permittedAttributes = []
+    _positions = True
 
-        super().__init__(self.__permittedAttributes, [KMLGeometry], False)
+    def __init__(self):
+        super().__init__([KMLGeometry], False)
         
-    def __str__(self):
-        tmp = self.indent + '<MultiGeometry{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '<MultiGeometry>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<MultiGeometry{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</MultiGeometry>' + nl
     
 class Model(KMLGeometry):
+    _attributes = ['altitudeMode', 'location', 'orientation', 'modelScale',
+                   'link', 'resourceMap']
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['altitudeMode', 'location', 'orientation', 'modelScale',
-                                      'link', 'resourceMap']
-        super().__init__(self.__permittedAttributes, **kwargs)
+        super().__init__(**kwargs)
 
         self.resourceMap = ResourceMap()
 
-    def __str__(self):
-        tmp = self.indent + '<Model{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Model>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Model{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Model>' + nl
 
 class GXCoord(KMLObject):
+    _attributes = ['latitude', 'longitude', 'altitude']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['latitude', 'longitude', 'altitude']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
         for k in kwargs:
-            if k in self.__permittedAttributes:
+            if k in self._permitted:
                 if kwargs[k] is not None:
                     setattr(self, k, kwargs[k])
 
     def __str__(self):
         tmp = '<gx:coord>'
-        if 'longitude' in self.__dict__ and \
-           'latitude' in self.__dict__:
-            if self.longitude is not None and \
-               self.latitude is not None:
-                tmp += '{} {}'.format(self.longitude, self.latitude)
-                if 'altitude' in self.__dict__:
-                    tmp += ' {}'.format(self.altitude)
+        if self.longitude is not None and \
+           self.latitude is not None:
+            tmp += '{} {}'.format(self.longitude, self.latitude)
+            if self.altitude is not None:
+                tmp += ' {}'.format(self.altitude)
         tmp += '</gx:coord>\n'
         return tmp
 
 class GXAngle(KMLObject):
+    _attributes = ['heading', 'tilt', 'roll']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['heading', 'tilt', 'roll']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
         for k in kwargs:
-            if k in self.__permittedAttributes:
+            if k in self._permitted:
                 if kwargs[k] is not None:
                     setattr(self, k, kwargs[k])
 
     def __str__(self):
         tmp = '<gx:angles>'
-        if 'heading' in self.__dict__:
+        if self.heading is not None:
             tmp += '{}'.format(self.heading)
-        if 'tilt' in self.__dict__:
+        if self.tilt is not None:
             tmp += ' {}'.format(self.tilt)
-        if 'roll' in self.__dict__:
+        if self.roll is not None:
             tmp += ' {}'.format(self.roll)
         tmp += '</gx:angles>\n'
         return tmp
 
-class TrackTimes(Container):
+class TrackTimes(ColumnContainer):
+    # <when> values of a Track, stored as seconds since 1970-01-01 UTC and formatted on output
+    __slots__ = ('__format',)
+
     def __init__(self):
-        self.__permittedAttributes = []
-        super().__init__(self.__permittedAttributes, [KMLDateTime], False)
+        self.__format = 'dateTime'
+        super().__init__(KMLDateTime, ['timestamp'], ['timestamp'], [KMLDateTime], False)
     
-    def __str__(self):
-        tmp = ''
-        for i in range(len(self)):
-            tmp += self.indent + '<when>{}</when>\n'.format(self[i])
-        return tmp
+    def extend(self, values, timeFormat = None):
+        """
+        Appends many times at once.
         
-class TrackCoords(Container):
-    def __init__(self):
-        self.__permittedAttributes = []
-        super().__init__(self.__permittedAttributes, [GXCoord], False)
+        Values may be KMLDateTime, datetime or date/time strings.  Strings are parsed as a
+        column by KMLDateTime.parseColumn(), using timeFormat if given.  The output format
+        is taken from the first values added.
+        """
+        timestamps, format = KMLDateTime.parseColumn(values, timeFormat)
+        if len(self) == 0:
+            self.__format = format
+        super().extend(timestamps)
     
-    def __str__(self):
-        tmp = ''
-        for i in range(len(self)):
-            tmp += self.indent + str(self[i])
-        return tmp
+    def append(self, value, copy = True):
+        self.extend([value])
+        return value
+    
+    def insert(self, index, value, copy = True):
+        if type(value) is not KMLDateTime:
+            value = KMLDateTime(value)
+        return super().insert(index, value)
+    
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return super().__getitem__(index)
+        return KMLDateTime(datetime(1970, 1, 1) + _timedelta(seconds = self.columns()[0][index]), self.__format)
+    
+    def __lines(self, start):
+        return ['<when>' + value + '</when>' for value in KMLDateTime.formatColumn(self.columns()[0][start:], self.__format)]
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        yield from self._formatted(_indent(depth, nl), nl, self.__format, self.__lines)
         
-class TrackAngles(Container):
+class TrackCoords(ColumnContainer):
+    # gx:coord values of a Track, stored as longitude, latitude and altitude columns
+    _positions = True
+
     def __init__(self):
-        self.__permittedAttributes = []
-        super().__init__(self.__permittedAttributes, [GXAngle], False)
+        super().__init__(GXCoord, ['longitude', 'latitude', 'altitude'], [], [GXCoord], False)
+    
+    def _lonLat(self):
+        return self.columns()[:2]
+    
+    def __lines(self, start, precision):
+        columns = [c[start:] for c in self.columns()]
+        text = [_formatColumn(c, precision) for c in columns]
+        lines = []
+        for lon, lat, alt, l, a in zip(*text, columns[0], columns[2]):
+            if l == l and lat != 'nan':
+                if a == a:
+                    lines.append('<gx:coord>' + lon + ' ' + lat + ' ' + alt + '</gx:coord>')
+                else:
+                    lines.append('<gx:coord>' + lon + ' ' + lat + '</gx:coord>')
+            else:
+                lines.append('<gx:coord></gx:coord>')
+        return lines
     
-    def __str__(self):
-        tmp = ''
-        for i in range(len(self)):
-            tmp += self.indent + str(self[i])
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        precision = self._inherited('precision')
+        yield from self._formatted(_indent(depth, nl), nl, precision, lambda start: self.__lines(start, precision))
+        
+class TrackAngles(ColumnContainer):
+    # gx:angles values of a Track, stored as heading, tilt and roll columns
+    def __init__(self):
+        super().__init__(GXAngle, ['heading', 'tilt', 'roll'], [], [GXAngle], False)
+    
+    def __lines(self, start, precision):
+        lines = []
+        for values in zip(*[_formatColumn(c[start:], precision) for c in self.columns()]):
+            heading, tilt, roll = values
+            tmp = heading if heading != 'nan' else ''
+            if tilt != 'nan':
+                tmp += ' ' + tilt
+            if roll != 'nan':
+                tmp += ' ' + roll
+            lines.append('<gx:angles>' + tmp + '</gx:angles>')
+        return lines
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        precision = self._inherited('precision')
+        yield from self._formatted(_indent(depth, nl), nl, precision, lambda start: self.__lines(start, precision))
         
 class Track(KMLGeometry):
+    # __tail is where update() reads from next: the byte offset in the CSV file, the fields
+    # read, their positions in each row and the number of headings
+    __slots__ = ('__tail',)
+    _attributes = ['extendedData', 'schema', 'times', 'timeField', 'csvFile',
+                   'timeFormat', 'coords', 'coordFields', 'autoload',
+                   'angles', 'angleFields', 'altitudeMode', 'model', 'precision']
+    _tag = 'gx:Track'
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['extendedData', 'schema', 'times', 'timeField', 'csvFile',
-                                      'timeFormat', 'coords', 'coordFields', 'loadCSV', 'autoload',
-                                      'angles', 'angleFields', 'altitudeMode', 'model']
-        super().__init__(self.__permittedAttributes, **kwargs)
+        self.__tail = None
+        super().__init__(**kwargs)
 
         self.times = TrackTimes()
         self.coords = TrackCoords()
         self.angles = TrackAngles()
         
-        if 'autoload' in self.__dict__:
+        if self.autoload is not None:
             if self.autoload:
                 self.loadCSV()
     
     def loadCSV(self):
-        if 'timeField' not in self.__dict__:
+        # Read every column needed in one pass, then store each one as a whole
+        fields = self._prepare()
+        self._fill(_readColumns(self.csvFile, fields))
+    
+    def update(self):
+        """
+        Loads the rows added to the CSV file since it was last read, for a log that is
+        still being written.  The first call loads the whole file.
+        
+        Only the new part of the file is read, and only whole lines: a row still being
+        written is left for the next call.  Use update() rather than loadCSV() to load a
+        file that update() will be called on again.
+        
+        Syntax:
+        
+            added = x.update()
+        
+        Returns the number of rows added.
+        """
+        import io, os.path
+        if self.__tail is None:
+            fields = self._prepare()
+            offset, positions, width = 0, None, None
+        else:
+            offset, fields, positions, width = self.__tail
+        if os.path.getsize(self.csvFile) <= offset:
+            return 0
+        with open(self.csvFile, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        import csv
+        reader = csv.reader(io.TextIOWrapper(io.BytesIO(data[:end]), newline = ''))
+        if positions is None:
+            positions, width = _csvPositions(reader, fields, self.csvFile)
+        columns = _readRows(reader, positions, width)
+        self.__tail = (offset + end, fields, positions, width)
+        if len(columns[0]) > 0:
+            self._fill(dict(zip(fields, columns)))
+        return len(columns[0])
+    
+    def follow(self, interval = 1.0, idle = None):
+        """
+        Follows a CSV file that is still being written, as tail -f does.
+        
+        Calls update() every interval seconds, and yields the number of rows added each
+        time there are new rows.  Stops once no rows have been added for idle seconds,
+        if idle is given.
+        
+        Syntax:
+        
+            for added in x.follow([interval], [idle]):
+                k.save('live.kml')
+        
+        Each poll only reads the new part of the file.  Inside cached(), writing the track
+        again only formats the new rows, so the work per poll does not grow with the
+        length of the log:
+        
+            with cached():
+                for added in x.follow():
+                    k.save('live.kml')
+        """
+        last = _monotonic()
+        while True:
+            start = _monotonic()
+            added = self.update()
+            if added > 0:
+                last = start
+                yield added
+            elif idle is not None and start - last >= idle:
+                return
+            _sleep(max(0, interval - (_monotonic() - start)))
+    
+    def _prepare(self):
+        # Checks the settings needed to load the CSV file and sets up the ExtendedData
+        # arrays.  Returns the fields to read.
+        if self.timeField is None:
             raise ValueError('Time field must be set')
-        if 'coordFields' not in self.__dict__:
+        if self.coordFields is None:
             raise ValueError('Coord fields must be set')
-        if 'schema' not in self.__dict__:
+        if self.schema is None:
             raise RuntimeError('Cannot loadCSV(). No schema set')
         
-        if 'csvFile' not in self.__dict__:
-            if 'csvFile' in self.schema.__dict__:
+        if self.csvFile is None:
+            if self.schema.csvFile is not None:
                 self.csvFile = self.schema.csvFile
             else:
                 raise RuntimeError('Cannot loadCSV(). No CSV file set')
         
-        if 'extendedData' not in self.__dict__:
+        if self.extendedData is None:
             raise ValueError('Track has no data. Nothing to output')
         
         self.extendedData = ExtendedData(schemaData = SchemaData(schema = self.schema, autoload = False))
         # Delete time and coord data from the SchemaData as they are stored in the track
         if self.timeField in self.extendedData.schemaData:
             del self.extendedData.schemaData[self.extendedData.schemaData.index(self.timeField)]
-        if 'coordFields' not in self.__dict__:
+        if self.coordFields is None:
             raise RuntimeError('Cannot loadCSV(). No coord fields set')
         if len(self.coordFields) < 2:
             raise RuntimeError('Cannot loadCSV(). Coords needs at least longitude and latitude')
@@ -2008,379 +3949,816 @@ class Track(KMLGeometry):
         for c in self.coordFields:
             if c in self.extendedData.schemaData:
                 del self.extendedData.schemaData[self.extendedData.schemaData.index(c)]
-        if 'angleFields' in self.__dict__:
+        if self.angleFields is not None:
             for c in self.angleFields:
                 if c in self.extendedData.schemaData:
                     del self.extendedData.schemaData[self.extendedData.schemaData.index(c)]
         
-        import csv
-        with open(self.csvFile, newline = '') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                for i in range(len(self.extendedData.schemaData)):
-                    self.extendedData.schemaData[i].append(SimpleArrayData(value = row[self.extendedData.schemaData[i].name]))
-                if 'timeFormat' in self.__dict__:
-                    self.times.append(KMLDateTime(datetime.strptime(row[self.timeField], self.timeFormat)))
-                else:
-                    self.times.append(KMLDateTime(row[self.timeField]))
-                lon = None if not number.isFloat(row[self.coordFields[0]]) else number(row[self.coordFields[0]])
-                lat = None if not number.isFloat(row[self.coordFields[1]]) else number(row[self.coordFields[1]])
-                if len(self.coordFields) == 2:
-                    alt = None if not number.isInt(row[self.coordFields[2]]) else number(row[self.coordFields[2]])
-                else:
-                    alt = None 
-                self.coords.append(GXCoord(longitude = lon, latitude = lat, altitude = alt))
-                if 'angleFields' in self.__dict__:
-                    if len(self.angleFields) > 0:
-                        heading = None if not number.isFloat(row[self.angleFields[0]]) else number(row[self.angleFields[0]])
-                    else:
-                        heading = None 
-                    if len(self.angleFields) > 1:
-                        tilt = None if not number.isFloat(row[self.angleFields[1]]) else number(row[self.angleFields[1]])
-                    else:
-                        tilt = None 
-                    if len(self.angleFields) > 2:
-                        roll = None if not number.isFloat(row[self.angleFields[2]]) else number(row[self.angleFields[2]])
-                    else:
-                        roll = None
-                    if len(self.angleFields) > 0: 
-                        self.angles.append(GXAngle(heading = heading, tilt = tilt, roll = roll))
+        angleFields = self.angleFields[:3] if self.angleFields is not None else []
+        arrays = [x for x in self.extendedData.schemaData if type(x) is SimpleArray]
+        return list(dict.fromkeys([self.timeField] + self.coordFields[:3] + angleFields + [x.name for x in arrays]))
+    
+    def _fill(self, columns):
+        # Stores a dict of field name to raw CSV values for the fields from _prepare()
+        angleFields = self.angleFields[:3] if self.angleFields is not None else []
+        arrays = [x for x in self.extendedData.schemaData if type(x) is SimpleArray]
+        self.times.extend(columns[self.timeField], self.timeFormat)
+        self.coords.extend(*[_floatColumn(columns[c]) for c in self.coordFields[:3]])
+        if len(angleFields) > 0:
+            self.angles.extend(*[_floatColumn(columns[c]) for c in angleFields])
+        for a in arrays:
+            a.extend(columns[a.name])
         
-    def __str__(self):
-        tmp = self.indent + '<gx:Track{}>\n'.format(self.getID)
-        if 'altitudeMode' in self.__dict__:
-            tmp += str(self.altitudeMode)
-        tmp += str(self.times)
-        tmp += str(self.coords)
-        tmp += str(self.angles)
-        tmp += str(self.extendedData)
-        tmp += self.indent + '</gx:Track>\n'
-        return tmp
+    def _keepRows(self, rows, length):
+        # Keeps the given rows of every per-point list that has length rows, so times,
+        # coords, angles and ExtendedData arrays stay aligned
+        columns = [self.times, self.coords, self.angles]
+        if self.extendedData is not None and self.extendedData.schemaData is not None:
+            columns += [x for x in self.extendedData.schemaData if type(x) is SimpleArray]
+        for c in columns:
+            if len(c) == length:
+                c._keepRows(rows)
+    
+    def simplify(self, tolerance):
+        """
+        Removes points that add little to the shape of the track, using the Douglas-Peucker
+        algorithm.  The when, angles and ExtendedData values of each removed point are
+        removed with it.  Points without a position are kept.
+        
+        Syntax:
+        
+            ratio = x.simplify(tolerance)
+        
+        Args:
+        
+            tolerance       : (float) Largest distance in metres a removed point may be
+                                      from the simplified track
+        
+        Returns the reduction ratio: the fraction of the points that were removed.
+        """
+        longitudes, latitudes = self.coords.columns()[:2]
+        n = len(longitudes)
+        located = [i for i in range(n) if longitudes[i] == longitudes[i] and latitudes[i] == latitudes[i]]
+        if len(located) == n:
+            keep = _simplify(longitudes, latitudes, tolerance)
+        else:
+            kept = _simplify([longitudes[i] for i in located], [latitudes[i] for i in located], tolerance)
+            keep = sorted(set(located[k] for k in kept) | set(range(n)).difference(located))
+        return self.__keep(keep, n)
+    
+    def resample(self, interval):
+        """
+        Keeps one point in every interval seconds: the first point of each interval,
+        counted from the first point of the track.  The last point is always kept.  The
+        coords, angles and ExtendedData values of each removed point are removed with it.
+        
+        Syntax:
+        
+            ratio = x.resample(interval)
+        
+        Args:
+        
+            interval        : (float) Seconds between the points kept
+        
+        Returns the reduction ratio: the fraction of the points that were removed.
+        
+        Errors:
+        
+            ValueError      : interval is not positive
+        """
+        if not interval > 0:
+            raise ValueError('Interval must be positive')
+        times = self.times.columns()[0]
+        n = len(times)
+        if n < 3:
+            return 0.0
+        start = times[0]
+        bucket = 0
+        keep = [0]
+        for i, t in enumerate(_islice(times, 1, n - 1), 1):
+            b = (t - start) // interval
+            if b != bucket:
+                keep.append(i)
+                bucket = b
+        keep.append(n - 1)
+        return self.__keep(keep, n)
+    
+    def decimate(self, minDistance = 0, minTime = 0):
+        """
+        Removes points that are too close to the last point kept, such as the points
+        logged while stopped.  A point is kept if it is at least minDistance metres and
+        at least minTime seconds from the last point kept.  Points without a position are
+        judged on time alone.  The first and last points are always kept.  The when,
+        angles and ExtendedData values of each removed point are removed with it.
+        
+        Syntax:
+        
+            ratio = x.decimate([minDistance], [minTime])
+        
+        Args:
+        
+            minDistance     : (float) Metres a point must be from the last point kept
+            minTime         : (float) Seconds a point must be after the last point kept
+        
+        Returns the reduction ratio: the fraction of the points that were removed.
+        
+        Errors:
+        
+            ValueError      : minTime is given and the track does not have a time for
+                              every point
+        """
+        longitudes, latitudes = self.coords.columns()[:2]
+        n = len(longitudes)
+        times = self.times.columns()[0]
+        if len(times) != n:
+            if minTime > 0:
+                raise ValueError('Track does not have a time for every point')
+            times = _repeat(0.0, n)
+        if n < 3:
+            return 0.0
+        xs, ys = _project(longitudes, latitudes)
+        nan = float('nan')
+        x, y, last = nan, nan, None
+        keep = []
+        for i, (px, py, t) in enumerate(zip(xs, ys, times)):
+            if last is not None:
+                if t - last < minTime or _hypot(px - x, py - y) < minDistance:
+                    continue
+            keep.append(i)
+            last = t
+            if px == px and py == py:
+                x, y = px, py
+        if keep[-1] != n - 1:
+            keep.append(n - 1)
+        return self.__keep(keep, n)
+    
+    def __keep(self, keep, n):
+        # Keeps the rows in keep out of n and returns the fraction removed
+        if len(keep) == n:
+            return 0.0
+        self._keepRows(keep, n)
+        return 1 - len(keep) / n
+    
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:Track{}>'.format(self.getID) + nl
+        if self.altitudeMode is not None:
+            yield from self.altitudeMode._render(depth + 1, nl)
+        yield from self.times._render(depth + 1, nl)
+        yield from self.coords._render(depth + 1, nl)
+        yield from self.angles._render(depth + 1, nl)
+        yield from self.extendedData._render(depth + 1, nl)
+        yield indent + '</gx:Track>' + nl
 
 class Tracks(Container):
     def __init__(self):
-        self.__permittedAttributes = []
-        super().__init__(self.__permittedAttributes, [Track], False)
+        super().__init__([Track], False)
     
-    def __str__(self):
-        tmp = ''
-        for i in range(len(self)):
-            tmp += str(self[i])
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        for item in self:
+            yield from item._render(depth + 1, nl)
     
-class MultiTrack(KMLObject):
+class MultiTrack(KMLGeometry):
+    _attributes = ['interpolate', 'altitudeMode', 'tracks']
+    _tag = 'gx:MultiTrack'
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['interpolate', 'altitudeMode', 'tracks']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
         self.tracks = Tracks()
-        self.tracks.depth = self.depth
-
-    def __str__(self):
-        tmp = self.indent + '<gx:MultiTrack{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:MultiTrack\n'
-        return tmp
+    
+    def loadCSV(self, track, maxGap = None):
+        """
+        Loads a CSV log as one Track for each stretch of the log with a position.
         
-class NetworkLink(KMLFeature):
-    def __init__(self, **kwargs):
+        A new Track is started after any rows without a longitude or latitude, such as
+        the '-' written while there is no GPS fix, and after any gap in time longer than
+        maxGap.  The rows without a position are left out.  Each Track only has the
+        ExtendedData values of its own rows, so Google Earth does not draw the track
+        across the gaps.  The log is read a row at a time.
+        
+        Syntax:
         
-        self.__permittedAttributes = ['refreshVisibility','flyToView','link']
-        super().__init__(self.__permittedAttributes, **kwargs)
+            x.loadCSV(track, [maxGap])
+        
+        Args:
+        
+            track           : (Track) Track with the settings to load the log with, as
+                                      for Track.loadCSV().  Each Track added has the
+                                      same settings.
+            maxGap          : (float) Longest gap in seconds allowed within a Track
+                                      (optional)
+        
+        Errors:
+        
+            ValueError      : a setting needed to load the log is missing from track
+            KeyError        : a field is not in the heading row of the log
+        """
+        fields = track._prepare()
+        settings = {a: getattr(track, a) for a in ['schema', 'timeField', 'csvFile', 'timeFormat',
+                                                   'coordFields', 'angleFields', 'altitudeMode',
+                                                   'model', 'precision', 'extendedData']
+                    if getattr(track, a) is not None}
+        lonField, latField = fields.index(track.coordFields[0]), fields.index(track.coordFields[1])
+        segment = [[] for f in fields]
+        parse = None
+        last = None
+        for row in _chain(_iterRows(track.csvFile, fields), [None]):
+            if row is not None:
+                try:
+                    lon, lat = float(row[lonField]), float(row[latField])
+                    located = lon == lon and lat == lat
+                except ValueError:
+                    located = False
+                if located and maxGap is not None:
+                    if parse is None:
+                        parse = KMLDateTime._columnParser(row[0], track.timeFormat)[0]
+                    t = parse(row[0])
+                    gap = last is not None and t - last > maxGap
+                    last = t
+                else:
+                    gap = False
+            # End the current Track at a row without a position, a gap or the end of the log
+            if (row is None or not located or gap) and len(segment[0]) > 0:
+                t = Track(**settings)
+                t._prepare()
+                t._fill(dict(zip(fields, segment)))
+                self.tracks.append(t, False)
+                segment = [[] for f in fields]
+            if row is not None and located:
+                for c, v in zip(segment, row):
+                    c.append(v)
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:MultiTrack{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:MultiTrack>' + nl
+        
+class NetworkLink(KMLFeature):
+    _attributes = ['refreshVisibility','flyToView','link']
 
-    def __str__(self):
-        tmp = self.indent + '<NetworkLink{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</NetworkLink>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<NetworkLink{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</NetworkLink>' + nl
     
 class Placemark(KMLFeature):
-    def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['geometry']
-        super().__init__(self.__permittedAttributes, **kwargs)
+    _attributes = ['geometry']
 
-    def __str__(self):
-        tmp = self.indent + '<Placemark{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Placemark>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<Placemark{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</Placemark>' + nl
     
 class KMLOverlay(KMLFeature):
+    _attributes = ['color', 'drawOrder', 'icon']
+
     def __init__(self, **kwargs):
-        self.__permittedAttributes = ['color', 'drawOrder', 'icon']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
     
 class GroundOverlay(KMLOverlay):
+    _attributes = ['altitude', 'altitudeMode', 'latLonBox', 'latLonQuad']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['altitude', 'altitudeMode', 'latLonBox', 'latLonQuad']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<GroundOverlay{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</GroundOverlay>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<GroundOverlay{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</GroundOverlay>' + nl
     
 class OverlayXY(Vector):
+    _tag = 'overlayXY'
+
     def __init__(self, **kwargs):
-        super().__init__([], **kwargs)
-    
-    def __str__(self):
-        return self.indent + '<overlayXY {}/>\n'.format(super().__str__())
+        super().__init__(self._tag, **kwargs)
  
 class ScreenXY(Vector):
+    _tag = 'screenXY'
+
     def __init__(self, **kwargs):
-        super().__init__([], **kwargs)
-    
-    def __str__(self):
-        return self.indent + '<screenXY {}/>\n'.format(super().__str__())
+        super().__init__(self._tag, **kwargs)
  
 class RotationXY(Vector):
+    _tag = 'rotationXY'
+
     def __init__(self, **kwargs):
-        super().__init__([], **kwargs)
-    
-    def __str__(self):
-        return self.indent + '<rotationXY {}/>\n'.format(super().__str__())
+        super().__init__(self._tag, **kwargs)
  
 class Size(Vector):
+    _tag = 'size'
+
     def __init__(self, **kwargs):
-        super().__init__([], **kwargs)
-    
-    def __str__(self):
-        return self.indent + '<size {}/>\n'.format(super().__str__())
+        super().__init__(self._tag, **kwargs)
  
 class ScreenOverlay(KMLOverlay):
+    _attributes = ['overlayXY', 'screenXY', 'rotationXY', 'size', 'rotation']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['overlayXY', 'screenXY', 'rotationXY', 'size', 'rotation']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<ScreenOverlay{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</ScreenOverlay>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<ScreenOverlay{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</ScreenOverlay>' + nl
     
 class ViewVolume(KMLObject):
+    _attributes = ['leftFov', 'rightFov', 'bottomFov', 'topFov', 'near']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['leftFov', 'rightFov', 'bottomFov', 'topFov', 'near']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<ViewVolume>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</ViewVolume>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<ViewVolume>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</ViewVolume>' + nl
     
 class ImagePyramid(KMLObject):
+    _attributes = ['tileSize', 'maxWidth', 'maxHeight', 'gridOrigin']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['tileSize', 'maxWidth', 'maxHeight', 'gridOrigin']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<ImagePyramid>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</ImagePyramid>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<ImagePyramid>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</ImagePyramid>' + nl
     
 class PhotoOverlay(KMLObject):
+    _attributes = ['rotation', 'viewVolume', 'imagePyramid', 'point', 'shape']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['rotation', 'viewVolume', 'imagePyramid', 'point', 'shape']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<PhotoOverlay{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</PhotoOverlay>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<PhotoOverlay{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</PhotoOverlay>' + nl
 
 class UpdateAttr(Container):
     def __init__(self):
-        super().__init__([], [], False)
+        super().__init__([], False)
     
-    def __str__(self):
-        tmp = ''
-        for i in range(len(self)):
-            tmp += str(self[i])
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        for item in self:
+            yield from item._render(depth + 1, nl)
 
 class Update(KMLObject):
+    _attributes = ['targetHref', 'change', 'create', 'delete']
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['targetHref', 'change', 'create', 'delete']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
         self.change = UpdateAttr()
         self.create = UpdateAttr()
         self.delete = UpdateAttr()
 
-    def __str__(self):
-        tmp = self.indent + '<Update{}>\n'.format(self.getID)
-        if len(self.change) > 0:
-            tmp += self.indent + ' <Change>\n'
-            tmp += str(self.change)
-            tmp += self.indent + ' </Change>\n'
-        if len(self.create) > 0:
-            tmp += self.indent + ' <Create>\n'
-            tmp += str(self.create)
-            tmp += self.indent + ' </Create>\n'
+    @classmethod
+    def diff(cls, previous, current, targetHref = None):
+        """
+        Builds the Update that turns one state of a Document into another.
+        
+        Syntax:
+        
+            x = Update.diff(previous, current, [targetHref])
+        
+        Args:
+        
+            previous        : (Document) The Document as clients last loaded it, such as
+                                         a copy.deepcopy() taken when it was last sent
+            current         : (Document) The Document as it is now
+            targetHref      : (str) URL of the file clients loaded the Document from
+        
+        The members of the Documents and of the Folders in them are matched by id.
+        Members that are new, or have moved to another Folder, are created in full, and
+        members that have gone are deleted.  Other members that differ are changed by
+        sending just the values that differ: a child object with an id of its own is
+        changed in the same way, and one without is sent in full.  A member that has a
+        value removed, which a Change can not do, is deleted and created again.  The
+        values of the Document itself are changed in the same way, but can not be
+        removed.  The elements are written without line breaks.
+        
+        Errors:
+        
+            ValueError      : a Document, Folder or member has no id
+            ValueError      : the Document has a value removed, or previous has another id
+        """
+        if current.id is None:
+            raise ValueError('Document must have an id to be updated')
+        before, after = {}, {}
+        _members(previous, current.id, before)
+        _members(current, current.id, after)
+        update = cls()
+        if targetHref is not None:
+            update.targetHref = targetHref
+        # Values of the Document itself
+        changes = _changes(previous, current)
+        if changes is None:
+            raise ValueError('Document {} has a value removed, or a different id'.format(current.id))
+        for text in changes:
+            update.change.append(Fragment(text = text), False)
+        # Members inside a member that is created or deleted go with it
+        created = set()
+        for i, (item, parent) in after.items():
+            if parent in created or i not in before or before[i][1] != parent:
+                created.add(i)
+                continue
+            old = before[i][0]
+            if not isinstance(item, Container) and old._compactText() == item._compactText():
+                continue
+            changes = _changes(old, item)
+            if changes is None:
+                created.add(i)
+            else:
+                for text in changes:
+                    update.change.append(Fragment(text = text), False)
+        deleted = set()
+        for i, (item, parent) in before.items():
+            if i not in after or i in created:
+                deleted.add(i)
+                if parent not in deleted:
+                    update.delete.append(Fragment(text = '<{} targetId="{}"/>'.format(item._tag, i)), False)
+        # New members are created in their Document or Folder, in the order they are in it
+        targets = {}
+        for i in after:
+            parent = after[i][1]
+            if i in created and parent not in created:
+                targets.setdefault(parent, []).append(after[i][0])
+        for parent, items in targets.items():
+            container = current if parent == current.id else after[parent][0]
+            tag = container._tag
+            update.create.append(Fragment(text = '<{} targetId="{}">{}</{}>'.format(
+                tag, parent, ''.join(x._compactText() for x in items), tag)), False)
+        return update
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        # Deleted first, so that a member that is deleted and created again is not
+        # deleted after it has been created
+        indent = _indent(depth, nl)
+        inner = _indent(depth + 1, nl)
+        yield indent + '<Update{}>'.format(self.getID) + nl
+        if self.targetHref is not None:
+            yield inner + '<targetHref>{}</targetHref>'.format(self.targetHref) + nl
         if len(self.delete) > 0:
-            tmp += self.indent + ' <Delete>\n'
-            tmp += str(self.delete)
-            tmp += self.indent + ' </Delete>\n'
+            yield inner + '<Delete>' + nl
+            yield from self.delete._render(depth + 1, nl)
+            yield inner + '</Delete>' + nl
+        if len(self.create) > 0:
+            yield inner + '<Create>' + nl
+            yield from self.create._render(depth + 1, nl)
+            yield inner + '</Create>' + nl
+        if len(self.change) > 0:
+            yield inner + '<Change>' + nl
+            yield from self.change._render(depth + 1, nl)
+            yield inner + '</Change>' + nl
             
-        tmp += self.indent + '</Update>\n'
-        return tmp
+        yield indent + '</Update>' + nl
+
+def _members(container, parent, found):
+    # Adds every member of container, and of the Documents and Folders in it, to found
+    # as id: (member, id of the Document or Folder holding it), in document order
+    for item in container:
+        if item.id is None:
+            raise ValueError('{} in {} must have an id to be updated'.format(item.__class__.__name__, parent))
+        found[item.id] = (item, parent)
+        if isinstance(item, (Document, Folder)):
+            _members(item, item.id, found)
+
+def _changes(previous, current):
+    # Returns the text of the Change elements that turn previous into current: one for
+    # the values of current that differ, followed by those of each child object with an
+    # id that differs.  A child without an id, or that can not be changed itself, is
+    # written in full in the Change of current.  Returns None if the difference can not
+    # be made with a Change, such as a value being removed, or an item of a container
+    # such as a Schema being added, removed or changed.  The members of a Document or
+    # Folder are not compared.
+    if type(previous) is not type(current) or current.id is None or previous.id != current.id:
+        return None
+    if isinstance(current, Container) and not isinstance(current, KMLContainer):
+        if len(previous) != len(current) or any(a._compactText() != b._compactText() for a, b in zip(previous, current)):
+            return None
+    values = []
+    changes = []
+    for a in current._fields:
+        if a in ('id', 'precision'):
+            continue
+        old, new = getattr(previous, a), getattr(current, a)
+        if isinstance(old, KMLObject) or isinstance(new, KMLObject):
+            if new is None:
+                return None
+            if old is None or old._compactText() != new._compactText():
+                children = _changes(old, new) if old is not None and new.id is not None else None
+                if children is None:
+                    values.append(new._compactText())
+                else:
+                    changes += children
+        elif (old is None) != (new is None) or str(old) != str(new):
+            # Compared as written, as a copied Color or KMLDateTime is a different object
+            if new is None:
+                return None
+            tag = a.replace('_', ':') if a[:3] == 'gx_' else a
+            values.append('<{}>{}</{}>'.format(tag, new, tag))
+    if len(values) > 0:
+        tag = current._tag
+        changes.insert(0, '<{} targetId="{}">{}</{}>'.format(tag, current.id, ''.join(values), tag))
+    return changes
 
 class GXTour(KMLFeature):
-    def __init__(self, attributes, **kwargs):
-        
-        self.__permittedAttributes = attributes + ['playList']
-        super().__init__(self.__permittedAttributes)
+    _attributes = ['playList']
+    _tag = 'gx:Tour'
 
-    def __str__(self):
-        tmp = self.indent + '<gx:Tour{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:Tour>\n'
-        return tmp
+    def __init__(self, **kwargs):
+        super().__init__()
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:Tour{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:Tour>' + nl
 
 class GXTourPrimitive(KMLObject):
     # Inheritance placeholder class for all tour types
-    def __init__(self, permittedAttributes, **kwargs):
-        self.__permittedAttributes = permittedAttributes
-        super().__init__(self.__permittedAttributes, **kwargs)
+    __slots__ = ()
 
 class GXAnimatedUpdate(GXTourPrimitive):
+    _attributes = ['gx_duration', 'gx_delayedStart', 'update']
+    _tag = 'gx:AnimatedUpdate'
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['gx_duration', 'gx_delayedStart', 'update']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<gx:AnimatedUpdate{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:AnimatedUpdate>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:AnimatedUpdate{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:AnimatedUpdate>' + nl
 
 class GXFlyTo(GXTourPrimitive):
+    _attributes = ['gx_duration', 'gx_flyToMode', 'view']
+    _tag = 'gx:FlyTo'
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['gx_duration', 'gx_flyToMode', 'view']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<gx:FlyTo{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:FlyTo>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:FlyTo{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:FlyTo>' + nl
 
 class GXSoundCue(GXTourPrimitive):
+    _attributes = ['gx_delayedStart', 'href']
+    _tag = 'gx:SoundCue'
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['gx_delayedStart', 'href']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<gx:SoundCue{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:SoundCue>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:SoundCue{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:SoundCue>' + nl
 
 class GXTourControl(GXTourPrimitive):
+    _attributes = ['gx_playMode']
+    _tag = 'gx:TourControl'
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['gx_playMode']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<gx:TourControl{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:TourControl>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:TourControl{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:TourControl>' + nl
 
 class GXWait(GXTourPrimitive):
+    _attributes = ['gx_duration']
+    _tag = 'gx:Wait'
+
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = ['gx_duration']
-        super().__init__(self.__permittedAttributes)
+        super().__init__()
 
-    def __str__(self):
-        tmp = self.indent + '<gx:Wait{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</gx:Wait>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:Wait{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</gx:Wait>' + nl
 
 class GXPlayList(Container):
+    _tag = 'gx:Playlist'
+    
     def __init__(self, **kwargs):
-        
-        self.__permittedAttributes = []
-        super().__init__(self.__permittedAttributes, [GXTourPrimitive], False, **kwargs)
+        super().__init__([GXTourPrimitive], False, **kwargs)
 
-    def __str__(self):
-        tmp = self.indent + '<gx:Playlist>\n'
-        for i in range(len(self)):
-            tmp += str(self[i])
-        tmp += self.indent + '</gx:Playlist>\n'
-        return tmp
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<gx:Playlist>' + nl
+        for item in self:
+            yield from item._render(depth + 1, nl)
+        yield indent + '</gx:Playlist>' + nl
 
 class KML(KMLObject):
+    # precision sets the decimal places of every coordinate in the document that does
+    # not have its own
+    _attributes = ['hint', 'networkLinkControl', 'feature', 'precision']
+    _tag = 'kml'
+
     def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        if _hooks: _emit('serializeStart', self)
+        indent = _indent(depth, nl)
+        yield indent + '<?xml version="1.0" encoding="utf-8"?>' + nl
+        yield indent + '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2"'
+        if self.hint is not None: yield '{}'.format(self.hint)
+        yield '>' + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</kml>' + nl
+        if _hooks: _emit('serializeEnd', self)
+    
+    def iterChunks(self, pretty = True):
+        """
+        Returns a generator of the KML document text, in order, one element at a time.
         
-        self.__permittedAttributes = ['hint', 'feature', 'save']
-        super().__init__(self.__permittedAttributes)
-
-    def __str__(self):
-        tmp = self.indent + '<?xml version="1.0" encoding="utf-8"?>\n'
-        tmp += self.indent + '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2"'
-        if 'hint' in self.__dict__: tmp += '{}'.format(self.hint)
-        tmp += '>\n'
-        tmp += super().__str__()
-        tmp += self.indent + '</kml>\n'
-        return tmp
+        Joining the chunks gives the same text as str(), but the whole document never
+        has to be held in memory at once.  With pretty = False the text has no
+        indentation or line breaks.
+        
+        Syntax:
+        
+            for chunk in x.iterChunks():
+                ...
+        """
+        return self._render(0, '\n' if pretty else '')
+    
+    def write(self, fp, pretty = True):
+        """
+        Writes the KML document to an open text file (or any object with a write() method)
+        as it is generated.  With pretty = False the text has no indentation or line breaks.
+        
+        Syntax:
+        
+            with open('out.kml', 'w', encoding = 'utf-8') as f:
+                x.write(f)
+        """
+        for chunk in self.iterChunks(pretty):
+            fp.write(chunk)
     
-    def save(self, filename, overwrite = True):
+    def save(self, filename, overwrite = True, format = None, compresslevel = None, resources = None, pretty = True):
+        """
+        Saves the KML document to a file, as plain KML or as a KMZ archive.
+        
+        Syntax:
+        
+            x.save('out.kml')
+            x.save('out.kmz', compresslevel = 9, resources = {'files/icon.png': 'icon.png'})
+        
+        Args:
+        
+            filename        : (str) File to write
+            overwrite       : (bool) Replace the file if it already exists
+            format          : (str) 'kml' or 'kmz'.  Taken from the extension of filename
+                                    if not given.
+            compresslevel   : (int) Deflate level for a KMZ archive, 0 to 9
+            resources       : (dict) Extra files for a KMZ archive, such as icons or the
+                                     files of a Model's ResourceMap.  Maps the name in the
+                                     archive to a file path or an open binary file.
+            pretty          : (bool) Indent the document.  If False, it is written without
+                                     indentation or line breaks.
+        
+        A KMZ archive holds the document as doc.kml, followed by the resources.  The
+        document is compressed as it is generated, and resources are copied in blocks, so
+        neither is held in memory in full.
+        
+        Errors:
+        
+            ValueError      : format is not 'kml' or 'kmz', or resources are given for
+                              a KML file
+        """
         import os.path
         if os.path.isfile(filename):
             if not overwrite:
                 raise FileError('File {} already exists and overwrite is False'.format(filename))
-        with open(filename, 'w') as f:
-            f.write(str(self))
+        if format is None:
+            format = 'kmz' if os.path.splitext(filename)[1].lower() == '.kmz' else 'kml'
+        if format == 'kml':
+            if resources:
+                raise ValueError('Resources can only be saved in a KMZ archive')
+            with open(filename, 'w', encoding = 'utf-8') as f:
+                self.write(f, pretty)
+        elif format == 'kmz':
+            self.__saveKMZ(filename, compresslevel, resources or {}, pretty)
+        else:
+            raise ValueError('Unknown format {}.  Expected kml or kmz'.format(format))
+    
+    def __saveKMZ(self, filename, compresslevel, resources, pretty):
+        import io, shutil, zipfile
+        with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED, compresslevel = compresslevel) as z:
+            # The size is not known until the document has been written, so allow for a
+            # large one up front
+            with z.open('doc.kml', 'w', force_zip64 = True) as entry:
+                with io.TextIOWrapper(entry, encoding = 'utf-8') as f:
+                    self.write(f, pretty)
+            for name, source in resources.items():
+                if type(source) is str:
+                    z.write(source, name)
+                else:
+                    with z.open(name, 'w', force_zip64 = True) as entry:
+                        shutil.copyfileobj(source, entry)
+
+class Fragment(KMLObject):
+    """
+    KML text that is written out as it is, such as an element rendered in another process.
+    
+        x = Fragment(text = '<Placemark><name>Log</name>...</Placemark>')
+        document.append(x)
+    
+    The text is not checked.  It is written on a line of its own, indented to the depth
+    of the Fragment.
+    """
+    _attributes = ['text']
+    # The element written is not known
+    _tag = None
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        if self.text is not None:
+            yield _indent(depth, nl) + self.text + nl
 
 class LinkSnippet(KMLObject):
-    def __init__(self, **kwargs):
-        super().__init__(['text','maxLines'], **kwargs)
-        
-    def __str__(self):
+    _attributes = ['text', 'maxLines']
+    _tag = 'linkSnippet'
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
         if not self.checkAttributes(['text']):
-            return ''
+            return
         else:
-            tmp = self.indent + '<linkSnippet'
-            if 'maxLines' in self.__dict__:
-                tmp += ' maxLines="{}"'.format(self.maxLines)
-            tmp += '>{}</linkSnippet>\n'.format(self.text)
-            return tmp
+            yield indent + '<linkSnippet'
+            if self.maxLines is not None:
+                yield ' maxLines="{}"'.format(self.maxLines)
+            yield '>{}</linkSnippet>'.format(self.text) + nl
 
 class NetworkLinkControl(KMLObject):
-    def __init__(self, attributes, **kwargs):
-        
-        self.__permittedAttributes = attributes + ['minRefreshPeriod', 'maxSessionLength', 'cookie', 
-                                                   'message', 'linkName', 'linkDescription', 'linkSnippet',
-                                                   'expires', 'update', 'view']
-        super().__init__(self.__permittedAttributes)
+    _attributes = ['minRefreshPeriod', 'maxSessionLength', 'cookie',
+                   'message', 'linkName', 'linkDescription', 'linkSnippet',
+                   'expires', 'update', 'view']
 
-    def __str__(self):
-        tmp = self.indent + '<Template{}>\n'.format(self.getID)
-        tmp += super().__str__()
-        tmp += self.indent + '</Template>\n'
-        return tmp
+    def __init__(self, **kwargs):
+        super().__init__()
+
+    def _chunks(self, depth = 0, nl = '\n'):
+        indent = _indent(depth, nl)
+        yield indent + '<NetworkLinkControl{}>'.format(self.getID) + nl
+        yield from super()._chunks(depth, nl)
+        yield indent + '</NetworkLinkControl>' + nl
+
+def updateKML(previous, current, targetHref, minRefreshPeriod = None, cookie = None):
+    """
+    Builds the KML file that clients of a NetworkLink fetch to update a Document they
+    have already loaded.  It holds a NetworkLinkControl with the Update from
+    Update.diff(), so only what has changed is sent.
+    
+    Syntax:
+    
+        k = updateKML(previous, current, targetHref, [minRefreshPeriod], [cookie])
+    
+    Args:
+    
+        previous        : (Document) The Document as clients last loaded it
+        current         : (Document) The Document as it is now
+        targetHref      : (str) URL of the file clients loaded the Document from
+        minRefreshPeriod: (float) Fewest seconds between fetches (optional)
+        cookie          : (str) Text clients add to the query of their next fetch, such
+                                as a version number (optional)
+    
+    Returns the KML object.
+    
+    Errors:
+    
+        ValueError      : a Document, Folder or member has no id
+    """
+    control = NetworkLinkControl()
+    if minRefreshPeriod is not None:
+        control.minRefreshPeriod = minRefreshPeriod
+    if cookie is not None:
+        control.cookie = cookie
+    k = KML()
+    with noCopy():
+        control.update = Update.diff(previous, current, targetHref)
+        k.networkLinkControl = control
+    return k
 
 attributeTypes = {
     # Attribute name        : Data type
     'id'                    : str,
-    'depth'                 : int,
     'latitude'              : angle90,
     'longitude'             : angle180,
     'altitude'              : number,
@@ -2396,6 +4774,7 @@ attributeTypes = {
     'phoneNumber'           : str,
     'Snippet'               : Snippet,
     'maxLines'              : int,
+    'precision'             : int,
     'view'                  : KMLView,
     'begin'                 : KMLDateTime,
     'end'                   : KMLDateTime,
@@ -2493,6 +4872,7 @@ attributeTypes = {
     'timeField'             : str,
     'coordFields'           : list,
     'timeFormat'            : str,
+    'timestamp'             : number,
     'times'                 : TrackTimes,
     'coords'                : TrackCoords,
     'angles'                : TrackAngles,
@@ -2545,4 +4925,19 @@ attributeTypes = {
     'expires'               : KMLDateTime,
     'update'                : Update,
     'view'                  : KMLView,
+    'networkLinkControl'    : NetworkLinkControl,
 }
+
+# attributeTypes refers to the classes above, so their attribute types can only be filled in now
+def _subclasses(cls):
+    for c in cls.__subclasses__():
+        yield c
+        yield from _subclasses(c)
+
+# KMLObject holds the slots shared by every object, but is not used directly
+KMLObject._abstract = True
+# Nor is KMLContainer, which holds the index of Folder and Document
+KMLContainer._abstract = True
+KMLObject._freeze()
+for cls in set(_subclasses(KMLObject)):
+    cls._freeze()
@@ -0,0 +1,182 @@
+"""
+Serves a large Document to Google Earth one view at a time.
+
+Google Earth opens the root file, which holds a NetworkLink back to the server.  Each time
+the view stops moving, Earth asks for /view.kml with the bounding box of the view, and is
+sent only the features inside it.  Features are found with the index of the Document
+(see kml3.KMLContainer), and each response is kept so that a view asked for again, by
+any client, is not rendered again.
+Requests are handled with asyncio, so many clients can be connected at once.  Views are
+rendered one at a time in a worker thread, so a slow view does not hold up the others.
+
+From Python:
+
+    import server
+    s = server.TileServer(document, port = 8000)
+    s.run()
+
+then open http://localhost:8000/ in Google Earth.  Run it inside kml3.cached() to have each
+feature keep its rendering between views.  After changing the Document, call
+refresh() so the kept responses are forgotten.  The Document keeps its index up to date
+itself.
+
+Styles, Schemas and other members without a position are sent with every view, so
+styleUrls still work.  Features in Folders are sent without their Folders.
+"""
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import kml3
+
+_head = ('<?xml version="1.0" encoding="utf-8"?>\n'
+         '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+         ' <Document>\n')
+_tail = ' </Document>\n</kml>\n'
+_kmlType = 'application/vnd.google-earth.kml+xml'
+
+class TileServer(object):
+    """
+    HTTP server that answers each view of Google Earth with the features inside it.
+
+    Syntax:
+
+        x = TileServer(document, [host], [port], [cellSize], [maxFeatures], [cacheSize], [refreshTime])
+
+    Args:
+
+        document        : (Document) Document to serve
+        host            : (str) Address to listen on
+        port            : (int) Port to listen on
+        cellSize        : (float) Cell size of the index in degrees.  If not given, it is
+                                  chosen so there are a few features in each cell.
+        maxFeatures     : (int) Most features sent for one view, in document order
+        cacheSize       : (int) Number of responses kept
+        refreshTime     : (float) Seconds Earth waits after the view stops before
+                                  asking for it
+    """
+    def __init__(self, document, host = '127.0.0.1', port = 8000, cellSize = None,
+                 maxFeatures = 5000, cacheSize = 256, refreshTime = 1):
+        self.document = document
+        self.host = host
+        self.port = port
+        self.cellSize = cellSize
+        self.maxFeatures = maxFeatures
+        self.cacheSize = cacheSize
+        self.refreshTime = refreshTime
+        # A single thread, as neither the Document nor the responses kept can be used
+        # from two threads at once
+        self.__executor = ThreadPoolExecutor(1)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Indexes the features of the Document again and forgets the responses kept.
+        """
+        self.document.buildIndex(self.cellSize)
+        # Every feature with a position is in the whole earth
+        located = {id(f) for f in self.document.queryBBox(90, -90, 180, -180)}
+        self.__shared = []
+        self.__collect(self.document, located)
+        self.__cache = OrderedDict()
+
+    def __collect(self, container, located):
+        # Finds the members without a position in container, and in the Documents and
+        # Folders in it
+        for member in container:
+            if isinstance(member, kml3.KMLContainer):
+                self.__collect(member, located)
+            elif id(member) not in located:
+                self.__shared.append(member)
+
+    def root(self):
+        """
+        Returns the KML file Google Earth opens first: a NetworkLink to the views.
+        """
+        link = kml3.Link(None)
+        link.href = 'http://{}:{}/view.kml'.format(self.host, self.port)
+        link.viewRefreshMode = kml3.viewRefreshModeEnum.onStop
+        link.viewRefreshTime = self.refreshTime
+        link.viewFormat = 'BBOX=[bboxWest],[bboxSouth],[bboxEast],[bboxNorth]'
+        k = kml3.KML()
+        k.feature = kml3.NetworkLink(name = self.document.name or 'Features', link = link)
+        return str(k).encode('utf-8')
+
+    def view(self, west, south, east, north):
+        """
+        Returns the KML file of the features inside the given box, in degrees.
+        """
+        key = (round(west, 5), round(south, 5), round(east, 5), round(north, 5))
+        body = self.__cache.get(key)
+        if body is not None:
+            self.__cache.move_to_end(key)
+            return body
+        features = self.document.queryBBox(key[3], key[1], key[2], key[0])
+        if self.maxFeatures is not None:
+            features = features[:self.maxFeatures]
+        chunks = [_head]
+        # Each member is written at the depth it has when the Document is saved, so that a
+        # rendering kept inside kml3.cached() is used, and is not replaced by one at
+        # another depth
+        for member in self.__shared + features:
+            chunks.extend(member._render(member._depth()))
+        chunks.append(_tail)
+        body = ''.join(chunks).encode('utf-8')
+        self.__cache[key] = body
+        if len(self.__cache) > self.cacheSize:
+            self.__cache.popitem(last = False)
+        return body
+
+    def __respond(self, request):
+        # Returns the status and body for the first line of an HTTP request
+        try:
+            method, target, version = request.decode('latin-1').split()
+        except ValueError:
+            return '400 Bad Request', b''
+        if method != 'GET':
+            return '405 Method Not Allowed', b''
+        url = urlsplit(target)
+        if url.path in ('/', '/root.kml'):
+            return '200 OK', self.root()
+        if url.path != '/view.kml':
+            return '404 Not Found', b''
+        try:
+            box = [float(v) for v in parse_qs(url.query)['BBOX'][0].split(',')]
+        except (KeyError, ValueError):
+            return '400 Bad Request', b''
+        if len(box) != 4:
+            return '400 Bad Request', b''
+        return '200 OK', self.view(*box)
+
+    async def __handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            # The headers are not needed
+            while (await reader.readline()).strip():
+                pass
+            status, body = await asyncio.get_running_loop().run_in_executor(self.__executor, self.__respond, request)
+            writer.write('HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'
+                         .format(status, _kmlType, len(body)).encode('latin-1'))
+            writer.write(body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """
+        Starts listening, and returns the asyncio Server.
+        """
+        # A long backlog, so that clients connecting at the same moment are not refused
+        return await asyncio.start_server(self.__handle, self.host, self.port, backlog = 1024)
+
+    def run(self):
+        """
+        Serves until interrupted.
+        """
+        async def serve():
+            async with await self.start() as s:
+                await s.serve_forever()
+        asyncio.run(serve())
@@ -0,0 +1,113 @@
+import pytest
+
+from kml3 import *
+
+def placemark(i, lon = 153.123456):
+    c = Coordinates()
+    c.append(Coordinate(longitude = lon, latitude = -27.123456 - i))
+    return Placemark(id = 'p{}'.format(i), name = 'P{}'.format(i), geometry = Point(coordinates = c))
+
+def document():
+    d = Document(id = 'doc', name = 'Doc')
+    for i in range(4):
+        d.append(placemark(i))
+    f = Folder(id = 'f', name = 'Folder', precision = 2)
+    f.append(placemark(10))
+    d.append(f)
+    d.append(Style(id = 's', IconStyle = IconStyle(color = Color('ff0000ff'))))
+    t = Track(extendedData = ExtendedData())
+    t.times.extend(['2020-01-01T00:00:00Z', '2020-01-01T00:00:01Z'])
+    t.coords.extend([153.1, 153.2], [-27.1, -27.2], [1, 2])
+    d.append(Placemark(id = 't', geometry = t))
+    return d
+
+def pretty(x):
+    return str(x)
+
+def compact(x):
+    return ''.join(x._render(0, ''))
+
+def check(edit):
+    # Output written under cached() after the edit must be the same as that of a document
+    # built with the edit and written without any output kept
+    for output in (pretty, compact):
+        x = document()
+        with cached():
+            before = output(x)
+            edit(x)
+            after = output(x)
+        y = document()
+        edit(y)
+        expected = output(y)
+        assert after == expected
+        assert after != before
+        # Written again, with everything kept
+        with cached():
+            assert output(x) == expected
+
+def rename(d):
+    d[1].name = 'Renamed'
+
+def move(d):
+    d[2].geometry.coordinates[0].latitude = 45
+
+def replaceGeometry(d):
+    d[0].geometry = Point(coordinates = d[3].geometry.coordinates)
+
+def append(d):
+    d.append(placemark(20))
+
+def appendToFolder(d):
+    d[4].append(placemark(21))
+
+def remove(d):
+    del d[1]
+
+def rotate(d):
+    d.rotate(2)
+
+def reparent(d):
+    # Moved out of a Folder that rounds to 2 places, into a Document that does not round
+    with noCopy():
+        d.insert(0, d[4].pop(0), False)
+
+def reparentIntoFolder(d):
+    with noCopy():
+        d[4].append(d.pop(1), False)
+
+def editColor(d):
+    d[5].IconStyle.color.red = 0x11
+
+def editColumn(d):
+    d[6].geometry.coords.columns()[0][1] = 150.5
+    d[6].geometry.coords.invalidate()
+
+def appendRows(d):
+    d[6].geometry.coords.extend([153.3], [-27.3], [3])
+    d[6].geometry.times.extend(['2020-01-01T00:00:02Z'])
+
+@pytest.mark.parametrize('edit', [rename, move, replaceGeometry, append, appendToFolder,
+                                  remove, rotate, reparent, reparentIntoFolder, editColor,
+                                  editColumn, appendRows])
+def test_cached_output_follows_edits(edit):
+    check(edit)
+
+def test_cached_output_follows_datetime_edits():
+    x = TimeStamp(KMLDateTime('2020-01-01T00:00:00Z'))
+    with cached():
+        str(x)
+        x.when.value = '2021-05-05T00:00:00Z'
+        assert str(x) == str(TimeStamp(KMLDateTime('2021-05-05T00:00:00Z')))
+        x.when.format = 'gYear'
+        assert str(x) == str(TimeStamp(KMLDateTime('2021-05-05T00:00:00Z', 'gYear')))
+
+def test_cached_output_follows_precision():
+    for output in (pretty, compact):
+        x = document()
+        with cached():
+            output(x)
+            x.precision = 1
+            after = output(x)
+        y = document()
+        y.precision = 1
+        assert after == output(y)
@@ -0,0 +1,42 @@
+from xml.dom import minidom
+
+from kml3 import *
+
+LOG = '''LATITUDE,LONGITUDE,ALTITUDE,HEADING,TIMESTAMP,SPEED
+-,-,-,-,2017-05-16 04:44:51,-
+-27.40,153.00,10,90,2017-05-16 04:45:00,0
+-27.41,153.01,11,91,2017-05-16 04:45:01,5
+-,-,-,-,2017-05-16 04:45:02,6
+-27.42,153.02,12,92,2017-05-16 04:45:03,7
+-27.43,153.03,13,93,2017-05-16 04:45:04,8
+-27.44,153.04,14,94,2017-05-16 04:50:00,9
+'''
+
+def multiTrack(log, maxGap = None):
+    schema = Schema(name = 'obd', id = 'obd')
+    schema.loadFromCSV(log)
+    track = Track(schema = schema, csvFile = log, timeField = 'TIMESTAMP',
+                  timeFormat = '%Y-%m-%d %H:%M:%S',
+                  coordFields = ['LONGITUDE', 'LATITUDE', 'ALTITUDE'],
+                  angleFields = ['HEADING'], extendedData = ExtendedData())
+    x = MultiTrack()
+    x.loadCSV(track, maxGap)
+    return x
+
+def test_multitrack_is_a_placemark_geometry(tmp_path):
+    log = tmp_path / 'log.csv'
+    log.write_text(LOG)
+    p = Placemark(id = 'p', name = 'Drive', geometry = multiTrack(str(log), 60))
+    d = Document(id = 'doc')
+    d.append(p)
+    k = KML()
+    k.feature = d
+    out = tmp_path / 'out.kml'
+    k.save(str(out))
+    dom = minidom.parse(str(out))
+    placemark = dom.getElementsByTagName('Placemark')[0]
+    multi = placemark.getElementsByTagName('gx:MultiTrack')
+    assert len(multi) == 1
+    # Split at the row without a position and at the five minute gap
+    tracks = multi[0].getElementsByTagName('gx:Track')
+    assert [len(t.getElementsByTagName('gx:coord')) for t in tracks] == [2, 2, 1]
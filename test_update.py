@@ -0,0 +1,92 @@
+import copy
+from xml.dom import minidom
+
+from kml3 import *
+
+def placemark(i):
+    c = Coordinates()
+    c.append(Coordinate(longitude = 153, latitude = -27 - i))
+    return Placemark(id = 'p{}'.format(i), name = 'P{}'.format(i), geometry = Point(coordinates = c))
+
+def document():
+    d = Document(id = 'doc', name = 'Doc')
+    for i in range(3):
+        d.append(placemark(i))
+    s = Style(id = 's', ListStyle = ListStyle(id = 'ls'))
+    s.ListStyle.append(ItemIcon(state = 'open', href = 'open.png'))
+    s.IconStyle = IconStyle(id = 'is', color = Color('ff0000ff'),
+                            hotSpot = HotSpot(id = 'hs', x = 1, y = 2, xunits = 'pixels', yunits = 'pixels'))
+    d.append(Placemark(id = 'styled', name = 'Styled', styleSelector = s))
+    return d
+
+def diff(edit):
+    # The Update from a document to the same document after edit, parsed, with the
+    # elements in its Delete, Create and Change by action
+    current = document()
+    previous = copy.deepcopy(current)
+    edit(current)
+    update = minidom.parseString(str(Update.diff(previous, current))).documentElement
+    actions = {}
+    for action in update.childNodes:
+        if action.nodeType == action.ELEMENT_NODE:
+            actions[action.tagName] = [e for e in action.childNodes if e.nodeType == e.ELEMENT_NODE]
+    return actions
+
+def test_unchanged():
+    assert diff(lambda d: None) == {}
+
+def test_unchanged_color():
+    # A copied Color is a different object with the same value, so only the scale is sent
+    def edit(d):
+        d[3].styleSelector.IconStyle.scale = 2
+    changed, = diff(edit)['Change']
+    assert changed.tagName == 'IconStyle' and changed.getAttribute('targetId') == 'is'
+    assert [e.tagName for e in changed.childNodes] == ['scale']
+
+def test_create():
+    actions = diff(lambda d: d.append(placemark(9)))
+    assert list(actions) == ['Create']
+    target, = actions['Create']
+    assert target.tagName == 'Document' and target.getAttribute('targetId') == 'doc'
+    created = target.getElementsByTagName('Placemark')
+    assert [p.getAttribute('id') for p in created] == ['p9']
+
+def test_delete():
+    def edit(d):
+        del d[1]
+    actions = diff(edit)
+    assert list(actions) == ['Delete']
+    deleted, = actions['Delete']
+    assert deleted.tagName == 'Placemark' and deleted.getAttribute('targetId') == 'p1'
+
+def test_change_of_a_value():
+    def edit(d):
+        d[0].name = 'Renamed'
+    actions = diff(edit)
+    assert list(actions) == ['Change']
+    changed, = actions['Change']
+    assert changed.toxml() == '<Placemark targetId="p0"><name>Renamed</name></Placemark>'
+
+def test_change_of_a_color():
+    def edit(d):
+        d[3].styleSelector.IconStyle.color.red = 0x11
+    changed, = diff(edit)['Change']
+    assert changed.tagName == 'IconStyle' and changed.getAttribute('targetId') == 'is'
+    assert [e.tagName for e in changed.childNodes] == ['color']
+
+def test_change_of_a_vector():
+    def edit(d):
+        d[3].styleSelector.IconStyle.hotSpot.x = 5
+    changed, = diff(edit)['Change']
+    assert changed.toxml() == '<hotSpot targetId="hs"><x>5.0</x></hotSpot>'
+
+def test_change_inside_a_container_member():
+    # Items of a ListStyle can not be changed one by one, so the ListStyle is sent in full
+    def edit(d):
+        d[3].styleSelector.ListStyle.append(ItemIcon(state = 'closed', href = 'closed.png'))
+    actions = diff(edit)
+    assert list(actions) == ['Change']
+    changed, = actions['Change']
+    assert changed.tagName == 'Style' and changed.getAttribute('targetId') == 's'
+    icons = changed.getElementsByTagName('ItemIcon')
+    assert [i.getElementsByTagName('state')[0].firstChild.data for i in icons] == ['open', 'closed']